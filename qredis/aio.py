@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import functools
+
+from redis.asyncio import Redis
+from qtpy.QtCore import QObject, Signal
+
+from .util import (
+    KeyItem,
+    PagedValue,
+    RETRY,
+    queue_fetch,
+    fetch_result,
+    fetch_all,
+    redis_page_async,
+)
+from .codec import TYPE_DECODES
+from .redis import QRedis, value_rows
+
+
+def install_event_loop(app=None):
+    """
+    Make the Qt event loop run asyncio (requires qasync) so coroutines and
+    their callbacks run on the GUI thread. Returns the loop.
+    """
+    import qasync
+
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+class AsyncQRedis(QObject):
+    """
+    asyncio counterpart of QRedis on redis.asyncio: no worker thread, the
+    coroutines run on the event loop (see install_event_loop to share it
+    with Qt).
+
+    The get() calls made in the same loop iteration are sent in a single
+    pipeline so many key loads can be in flight on one connection and
+    cost one round trip (ex: asyncio.gather(*(r.get(key) for key in keys))).
+    """
+
+    keysAdded = Signal(object)
+    keysDeleted = Signal(object)
+    keyRenamed = Signal(str, str)
+
+    TYPE_MAP = QRedis.TYPE_MAP
+
+    def __init__(self, *args, parent=None, **kwargs):
+        super(AsyncQRedis, self).__init__(parent)
+        self._decode_type_map = dict(TYPE_DECODES)
+        # get() calls waiting for the next pipeline: (key, count, future)
+        self._pending = []
+        # running tasks (the loop only keeps weak references to them)
+        self._tasks = set()
+        self.redis = Redis(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.redis, name)
+
+    def submit(self, coro, callback=None, errback=None):
+        """
+        Run a coroutine and deliver its result to callback (or its error to
+        errback). Returns the task: cancelling it discards the result.
+        """
+        task = self._spawn(coro)
+        task.add_done_callback(functools.partial(self._on_done, callback, errback))
+        return task
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _on_done(self, callback, errback, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        try:
+            if error is not None:
+                if errback is None:
+                    logging.error("error running %r", task, exc_info=error)
+                else:
+                    errback(error)
+            elif callback is not None:
+                callback(task.result())
+        except Exception:
+            logging.exception("error on %r callback", task)
+
+    def _fetch(self, key, count):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, count, future))
+        if len(self._pending) == 1:
+            loop.call_soon(self._schedule_flush)
+        return future
+
+    def _schedule_flush(self):
+        self._spawn(self._flush()).add_done_callback(self._on_flushed)
+
+    def _on_flushed(self, task):
+        # retrieve the error so it is not only reported at garbage collection
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("error fetching keys", exc_info=task.exception())
+
+    async def _flush(self):
+        pending, self._pending = self._pending, []
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            sizes = [queue_fetch(pipe, key, count) for key, count, _ in pending]
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as error:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        start = 0
+        for (key, count, future), size in zip(pending, sizes):
+            end = start + size
+            if not future.done():
+                try:
+                    future.set_result(fetch_result(results[start:end], count))
+                except Exception as error:
+                    future.set_exception(error)
+            start = end
+
+    async def get(self, key, default=None, page_size=None):
+        """QRedis.get: the KeyItem of the given key or default"""
+        fetched = await self._fetch(key, page_size)
+        if fetched is None:
+            return default
+        dtype, ttl, value, length, bookmark = fetched
+        if value is RETRY:
+            value = await fetch_all(self.redis, key, dtype)
+        if dtype in self._decode_type_map:
+            value = self._decode_type_map[dtype](value, key)
+        if bookmark is not None:
+            value = PagedValue(value, length, bookmark)
+        return KeyItem(self, key, dtype, ttl, value)
+
+    async def get_many(self, keys, page_size=None):
+        """KeyItems (or None) of the given keys, in a single round trip"""
+        return await asyncio.gather(*(self.get(key, page_size=page_size) for key in keys))
+
+    async def page(self, key, dtype, bookmark=None, count=1000):
+        """QRedis.page: one window of rows and the bookmark of the next one"""
+        items, bookmark = await redis_page_async(self.redis, key, dtype, bookmark, count)
+        return value_rows(dtype, self._decode_type_map[dtype](items, key)), bookmark
+
+    async def iter_pages(self, key, dtype, bookmark=None, count=1000):
+        """Iterate over the windows of rows of a collection value"""
+        while True:
+            rows, bookmark = await self.page(key, dtype, bookmark, count)
+            yield rows
+            if bookmark is None:
+                break
+
+    def pipeline(self, transaction=True):
+        return self.redis.pipeline(transaction=transaction)
+
+    async def type(self, name):
+        return (await self.redis.type(name)).decode()
+
+    async def keys(self, pattern="*"):
+        return [key async for key in self.scan_iter(pattern)]
+
+    async def scan(self, cursor=0, match="*", count=None):
+        cursor, keys = await self.redis.scan(cursor=cursor, match=match, count=count)
+        return int(cursor), [k.decode() for k in keys]
+
+    async def scan_iter(self, match="*", count=None):
+        async for key in self.redis.scan_iter(match=match, count=count):
+            yield key.decode()
+
+    async def has_key(self, key):
+        return bool(await self.redis.exists(key))
+
+    async def delete(self, *keys):
+        await self.redis.delete(*keys)
+        self.keysDeleted.emit(keys)
+
+    async def rename(self, old_key, new_key):
+        await self.redis.rename(old_key, new_key)
+        self.keyRenamed.emit(old_key, new_key)
+
+    async def close(self):
+        await self.redis.aclose()
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import concurrent.futures
+
+from redis.exceptions import ConnectionError
+
+
+class ClusterCursor:
+    """
+    SCAN cursor of a whole cluster: the cursor of each primary still being
+    scanned (node name: cursor). False once every primary was scanned.
+    """
+
+    __slots__ = ["cursors"]
+
+    def __init__(self, cursors):
+        self.cursors = cursors
+
+    def __bool__(self):
+        return bool(self.cursors)
+
+    def __repr__(self):
+        return "ClusterCursor({})".format(self.cursors)
+
+    def __str__(self):
+        # text form for URLs, ex: 10.0.0.1:7000=1234,10.0.0.2:7000=98
+        return ",".join("{}={}".format(name, cursor) for name, cursor in self.cursors.items())
+
+    @classmethod
+    def parse(cls, text):
+        """ClusterCursor from its str(). Raises ValueError if malformed"""
+        cursors = {}
+        for part in text.split(","):
+            name, sep, cursor = part.rpartition("=")
+            if not sep or not name:
+                raise ValueError("invalid cluster cursor {!r}".format(text))
+            cursors[name] = int(cursor)
+        return cls(cursors)
+
+
+class ClusterScanner:
+    """
+    Scans the keys of every primary of a redis cluster concurrently, one
+    thread per node, and merges them.
+
+    Each :meth:`scan` call runs one SCAN step on all the primaries not done
+    yet, in parallel: scanning the cluster takes as long as its slowest
+    shard instead of the sum of all of them.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+        self._executor = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _pool(self, size):
+        with self._lock:
+            if self._executor is None or self._size < size:
+                # more primaries than before (resharding)
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=size, thread_name_prefix="qredis-scan"
+                )
+                self._size = size
+            return self._executor
+
+    def scan(self, cursor=0, match="*", count=None):
+        """
+        One SCAN step on every primary. *cursor* is 0 to start or the
+        ClusterCursor returned by the previous step. Returns the next
+        ClusterCursor and the raw keys found.
+        """
+        redis = self.redis
+        if cursor:
+            cursors = cursor.cursors
+        else:
+            cursors = {node.name: 0 for node in redis.get_primaries()}
+        pool = self._pool(len(cursors))
+        futures = {
+            name: pool.submit(self._scan_node, name, node_cursor, match, count)
+            for name, node_cursor in cursors.items()
+        }
+        keys, cursors = [], {}
+        for name, future in futures.items():
+            node_cursor, node_keys = future.result()
+            keys.extend(node_keys)
+            if node_cursor:
+                cursors[name] = int(node_cursor)
+        return ClusterCursor(cursors), keys
+
+    def _scan_node(self, name, cursor, match, count):
+        node = self.redis.get_node(node_name=name)
+        if node is None:
+            raise ConnectionError("cluster node {} is gone".format(name))
+        # the node client has its own connection pool: safe to use from
+        # any thread
+        client = self.redis.get_redis_connection(node)
+        return client.scan(cursor=cursor, match=match, count=count)
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+class AsyncClusterScanner:
+    """
+    ClusterScanner of a redis.asyncio.RedisCluster: the SCAN steps of the
+    primaries run concurrently on the event loop instead of threads.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def scan(self, cursor=0, match="*", count=None):
+        """See :meth:`ClusterScanner.scan`"""
+        redis = self.redis
+        if cursor:
+            cursors = cursor.cursors
+        else:
+            # the nodes are only discovered with the first command
+            await redis.initialize()
+            cursors = {node.name: 0 for node in redis.get_primaries()}
+        names = list(cursors)
+        results = await asyncio.gather(
+            *(self._scan_node(name, cursors[name], match, count) for name in names)
+        )
+        keys, cursors = [], {}
+        for name, (node_cursor, node_keys) in zip(names, results):
+            keys.extend(node_keys)
+            if node_cursor:
+                cursors[name] = int(node_cursor)
+        return ClusterCursor(cursors), keys
+
+    async def _scan_node(self, name, cursor, match, count):
+        node = self.redis.get_node(node_name=name)
+        if node is None:
+            raise ConnectionError("cluster node {} is gone".format(name))
+        cursors, keys = await self.redis.scan(
+            cursor=cursor, match=match, count=count, target_nodes=node
+        )
+        return cursors[name], keys
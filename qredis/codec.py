@@ -0,0 +1,182 @@
+import pickle
+import functools
+import threading
+import collections
+
+import msgpack
+import msgpack_numpy
+
+
+def msgpack_pack(data):
+    return msgpack.packb(data, use_bin_type=True, default=msgpack_numpy.encode)
+
+
+def msgpack_unpack(buff):
+    return msgpack.unpackb(buff, raw=False, object_hook=msgpack_numpy.decode)
+
+
+def decode_utf8(v):
+    return v.decode()
+
+
+def decode_pickle(v):
+    return str(pickle.loads(v))
+
+
+def decode_msgpack(v):
+    return str(msgpack_unpack(v))
+
+
+DECODES = [
+    (decode_utf8, "utf-8"),
+    (decode_pickle, "pickle"),
+    (decode_msgpack, "msgpack"),
+    (str, "raw"),
+]
+
+_CODECS = dict((name, decoder) for decoder, name in DECODES)
+
+
+def _order(*names):
+    return tuple((_CODECS[name], name) for name in names)
+
+
+# first byte -> binary codecs worth trying, in DECODES order. Only codecs
+# which cannot possibly decode the value are left out so the result is the
+# same as trying DECODES one after the other:
+# - pickle opcodes are all below 0x99 (protocol 2+ pickles start with
+#   PROTO: 0x80 followed by the protocol number)
+# - msgpack accepts any first byte but 0xc1
+_SNIFF = tuple(
+    _order("raw")
+    if byte == 0xC1
+    else _order("pickle", "msgpack", "raw")
+    if byte < 0x99
+    else _order("msgpack", "raw")
+    for byte in range(256)
+)
+_PICKLE = _order("pickle", "msgpack", "raw")
+
+
+@functools.lru_cache(maxsize=None)
+def _promote(order, name):
+    """order with the codec *name* moved first"""
+    first = tuple(codec for codec in order if codec[1] == name)
+    return first + tuple(codec for codec in order if codec[1] != name)
+
+
+class Decoder:
+    """
+    Decodes redis values for display.
+
+    UTF-8 is always tried first (it is by far the most common and the
+    cheapest to reject). Otherwise the codec candidates are picked from
+    the first bytes of the value (pickle protocol header, msgpack type
+    prefixes) instead of trying every codec in turn. When they are still
+    ambiguous (ex: a msgpack map also starts with a valid pickle opcode),
+    the codec which last won for the same *hint* (usually the key name)
+    is tried first.
+
+    Decoded binary values are kept in a LRU cache keyed by their content
+    (the result doesn't depend on the key or field the value came from so
+    entries are shared between keys).
+    """
+
+    def __init__(self, cache_size=4096, max_cached_value=64 * 1024, max_hints=4096):
+        self.cache_size = cache_size
+        self.max_cached_value = max_cached_value
+        self.max_hints = max_hints
+        self._cache = collections.OrderedDict()
+        self._hints = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def candidates(self, value, hint=None):
+        """Binary codecs to try on a value which is not valid UTF-8"""
+        if value[0] == 0x80 and len(value) > 1 and 2 <= value[1] <= 5:
+            return _PICKLE
+        order = _SNIFF[value[0]]
+        name = None if hint is None else self._hints.get(hint)
+        if name is not None and name != order[0][1]:
+            order = _promote(order, name)
+        return order
+
+    def decode(self, value, hint=None):
+        if not isinstance(value, (bytes, bytearray)):
+            # ex: zset scores
+            return str(value)
+        try:
+            return value.decode()
+        except UnicodeDecodeError:
+            pass
+        cacheable = isinstance(value, bytes) and len(value) <= self.max_cached_value
+        if cacheable:
+            with self._lock:
+                result = self._cache.get(value)
+                if result is not None:
+                    self._cache.move_to_end(value)
+                    return result
+        for decoder, name in self.candidates(value, hint):
+            try:
+                result = decoder(value)
+            except Exception:
+                continue
+            break
+        # raw never fails: it must stay the last resort
+        remember = hint is not None and name != "raw"
+        remember = remember and self._hints.get(hint) != name
+        cacheable = cacheable and self.cache_size > 0
+        if remember or cacheable:
+            with self._lock:
+                if remember:
+                    self._hints[hint] = name
+                    self._hints.move_to_end(hint)
+                    if len(self._hints) > self.max_hints:
+                        self._hints.popitem(last=False)
+                if cacheable:
+                    self._cache[value] = result
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._hints.clear()
+
+
+DECODER = Decoder()
+
+
+def decode(value, hint=None):
+    return DECODER.decode(value, hint)
+
+
+def decode_hash(value, hint=None):
+    return {decode(k): decode(v, hint) for k, v in value.items()}
+
+
+def decode_list(value, hint=None):
+    return [decode(i, hint) for i in value]
+
+
+def decode_set(value, hint=None):
+    return {decode(i, hint) for i in value}
+
+
+def decode_zset(value, hint=None):
+    return {decode(member, hint): decode(score) for member, score in value}
+
+
+def decode_stream(value, hint=None):
+    return [(decode(event_id), decode_hash(data, hint)) for event_id, data in value]
+
+
+# decoder of the raw values of each redis type
+TYPE_DECODES = {
+    "string": decode,
+    "hash": decode_hash,
+    "list": decode_list,
+    "set": decode_set,
+    "zset": decode_zset,
+    "stream": decode_stream,
+}
@@ -42,11 +42,14 @@ class OpenRedisDialog(QDialog):
                 host = url
             if host:
                 kwargs["host"] = host
+            if self.ui.cluster.isChecked():
+                kwargs["cluster"] = True
         else:
             kwargs["unix_socket_path"] = self.ui.socket.text()
         opts = dict(
             filter=self.ui.filter.text(),
             split_by=self.ui.splitter.text(),
+            lazy=self.ui.lazy.isChecked(),
         )
         return QRedis(**kwargs), opts
 
@@ -0,0 +1,90 @@
+"""
+QRedis dump files: a stream of the DUMP payloads of keys.
+
+Layout (optionally gzip compressed as a whole)::
+
+    MAGIC
+    record*
+
+    record: key length (uint32) | payload length (uint32) | PTTL (int64)
+            | key (utf-8) | DUMP payload
+
+All integers are big endian. PTTL is in ms, -1 for keys without
+expiration. Payloads are restored as is with RESTORE so they can only be
+loaded by a server with a compatible RDB version.
+"""
+
+import gzip
+import struct
+
+MAGIC = b"QREDISDUMP\x01"
+_HEADER = struct.Struct(">IIq")
+
+
+class DumpWriter:
+    """Writes the records of a dump file, compressed with gzip if
+    *compress* (by default if the path ends with .gz)"""
+
+    def __init__(self, path, compress=None, compresslevel=6):
+        if compress is None:
+            compress = path.endswith(".gz")
+        self.path = path
+        if compress:
+            self.file = gzip.open(path, "wb", compresslevel=compresslevel)
+        else:
+            self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.keys = 0
+        # uncompressed bytes written
+        self.size = len(MAGIC)
+
+    def write(self, key, payload, pttl=-1):
+        key = key.encode() if isinstance(key, str) else key
+        self.file.write(_HEADER.pack(len(key), len(payload), pttl))
+        self.file.write(key)
+        self.file.write(payload)
+        self.keys += 1
+        self.size += _HEADER.size + len(key) + len(payload)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_dump(path):
+    """Yields the (key, payload, pttl) records of a dump file"""
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    with (gzip.open(path, "rb") if compressed else open(path, "rb")) as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a qredis dump file".format(path))
+        while True:
+            header = f.read(_HEADER.size)
+            if not header:
+                return
+            if len(header) < _HEADER.size:
+                raise ValueError("truncated dump file {}".format(path))
+            key_size, payload_size, pttl = _HEADER.unpack(header)
+            key = f.read(key_size)
+            payload = f.read(payload_size)
+            if len(payload) < payload_size:
+                raise ValueError("truncated dump file {}".format(path))
+            yield key.decode(), payload, pttl
+
+
+def restore_dump(redis, path, replace=False, chunk=1000):
+    """Load a dump file with pipelined RESTOREs. Returns the number of keys"""
+    pipe = redis.pipeline(transaction=False)
+    count = 0
+    for key, payload, pttl in read_dump(path):
+        pipe.restore(key, max(pttl, 0), payload, replace=replace)
+        count += 1
+        if not count % chunk:
+            pipe.execute()
+    pipe.execute()
+    return count
@@ -1,10 +1,11 @@
+import bisect
 import logging
 from datetime import timedelta
 from functools import partial
 from collections import OrderedDict
 
-from qtpy.QtCore import Qt
-from qtpy.QtGui import QIntValidator
+from qtpy.QtCore import Qt, Signal, QModelIndex, QAbstractTableModel
+from qtpy.QtGui import QFont, QIntValidator
 from qtpy.QtWidgets import (
     QWidget,
     QMainWindow,
@@ -15,11 +16,330 @@ from qtpy.QtWidgets import (
     QTreeWidgetItem,
 )
 
-from .util import redis_str
+from .util import PagedValue, redis_str
 from .qutil import ui_loadable
+from .redis import ConflictError, ValueDiff, value_rows
 
 ModifiedStyle = "background-color: rgb(255,200,200);"
 
+# collections with more elements than this are loaded page by page
+PAGE_SIZE = 1000
+
+
+def value_header(dtype):
+    return ("Key", "Value") if dtype in {"hash", "zset"} else ("Value",)
+
+
+class ValueModel(QAbstractTableModel):
+    """
+    Table model over a collection value which keeps the user edits as a
+    sparse diff on top of the original rows: *changed* (original row index:
+    new row), *deleted* (original row indexes, shown struck out until
+    applied) and *added* (new rows, each placed before an original row).
+
+    Subclasses provide the original rows by defining:
+
+    - base_count(): the number of original rows
+    - base_row(row): the original row (a tuple, one item per header
+      column) or None if it is not available yet (not loaded)
+
+    The original of every touched row is kept in *originals* so the diff
+    can be applied (and checked for conflicts) even if the row is not
+    available anymore.
+    """
+
+    edited = Signal()
+
+    def __init__(self, header, parent=None):
+        super(ValueModel, self).__init__(parent)
+        self.header = header
+        self.originals = {}
+        self.changed = {}
+        self.deleted = set()
+        self.added = []
+        # original row before which each added row is shown (sorted)
+        self._added_at = []
+        self._added_rows = None
+
+    def is_modified(self):
+        return bool(self.changed or self.deleted or self.added)
+
+    def diff(self, dtype):
+        added = [(at, tuple(row)) for at, row in zip(self._added_at, self.added)]
+        return ValueDiff(
+            dtype,
+            self.base_count(),
+            dict(self.originals),
+            dict(self.changed),
+            set(self.deleted),
+            added,
+        )
+
+    def _touch(self, base):
+        """Remember the original row before editing it"""
+        if base in self.originals:
+            return True
+        row = self.base_row(base) if base < self.base_count() else None
+        if row is None:
+            return False
+        self.originals[base] = row
+        return True
+
+    def _locate(self, row):
+        """Maps a view row to (original row, None) or (None, added index)"""
+        if self._added_rows is None:
+            self._added_rows = [at + i for i, at in enumerate(self._added_at)]
+        i = bisect.bisect_left(self._added_rows, row)
+        if i < len(self._added_rows) and self._added_rows[i] == row:
+            return None, i
+        return row - i, None
+
+    def row(self, row):
+        """Returns the row (a tuple) or None if it is not available yet"""
+        base, added = self._locate(row)
+        if added is not None:
+            return tuple(self.added[added])
+        return self.changed.get(base) or self.base_row(base)
+
+    def rows(self):
+        """Iterates over the rows of the edited value"""
+        for row in range(self.rowCount()):
+            if self._locate(row)[0] not in self.deleted:
+                yield self.row(row)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.base_count() + len(self.added)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.header)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.header[section]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in {Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole}:
+            row = self.row(index.row())
+            return "..." if row is None else str(row[index.column()])
+        elif role == Qt.FontRole:
+            if self._locate(index.row())[0] in self.deleted:
+                font = QFont()
+                font.setStrikeOut(True)
+                return font
+
+    def flags(self, index):
+        flags = super(ValueModel, self).flags(index)
+        if not index.isValid():
+            return flags
+        if self._locate(index.row())[0] not in self.deleted:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole:
+            return False
+        column = index.column()
+        base, added = self._locate(index.row())
+        if added is not None:
+            self.added[added][column] = value
+        else:
+            if not self._touch(base):
+                return False
+            row = self.row(index.row())
+            row = row[:column] + (value,) + row[column + 1 :]
+            if row == self.originals[base]:
+                self.changed.pop(base, None)
+            else:
+                self.changed[base] = row
+        self.dataChanged.emit(index, index)
+        self.edited.emit()
+        return True
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        if row < self.rowCount():
+            base, added = self._locate(row)
+        else:
+            base, added = self.base_count(), None
+        if added is None:
+            at, i = base, bisect.bisect_right(self._added_at, base)
+            self._touch(base)
+        else:
+            at, i = self._added_at[added], added
+        self.beginInsertRows(parent, row, row + count - 1)
+        for n in range(i, i + count):
+            self.added.insert(n, [""] * len(self.header))
+            self._added_at.insert(n, at)
+        self._added_rows = None
+        self.endInsertRows()
+        self.edited.emit()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        for row in range(row + count - 1, row - 1, -1):
+            base, added = self._locate(row)
+            if added is None:
+                if not self._touch(base):
+                    continue
+                self.deleted.add(base)
+                self.dataChanged.emit(
+                    self.index(row, 0), self.index(row, len(self.header) - 1)
+                )
+            else:
+                self.beginRemoveRows(parent, row, row)
+                del self.added[added]
+                del self._added_at[added]
+                self._added_rows = None
+                self.endRemoveRows()
+        self.edited.emit()
+        return True
+
+
+class LoadedValueModel(ValueModel):
+    """ValueModel over a fully loaded value stored as one list per column"""
+
+    def __init__(self, dtype, value, parent=None):
+        super(LoadedValueModel, self).__init__(value_header(dtype), parent)
+        if dtype in {"hash", "zset"}:
+            self.columns = (list(value.keys()), list(value.values()))
+        else:
+            self.columns = (list(value),)
+
+    def base_count(self):
+        return len(self.columns[0])
+
+    def base_row(self, row):
+        return tuple(column[row] for column in self.columns)
+
+
+class PagedValueModel(ValueModel):
+    """
+    ValueModel over a collection value too big to be loaded at once (a
+    KeyItem whose value is a PagedValue).
+
+    Windows of *page_size* rows are fetched on the I/O worker as the view
+    asks for them and only the *max_pages* most recently used windows are
+    kept in memory. Lists and zsets are addressed by index so any window
+    can be fetched directly. Hashes, sets and streams are walked with a
+    cursor: their rows are discovered as the view scrolls down
+    (canFetchMore/fetchMore) and only the bookmark of each window is kept
+    to fetch it again once dropped.
+    """
+
+    def __init__(self, item, page_size=PAGE_SIZE, max_pages=8, parent=None):
+        super(PagedValueModel, self).__init__(value_header(item.type), parent)
+        self.item = item
+        self.max_pages = max_pages
+        value = item.value
+        self.random_access = (
+            item.type in {"list", "zset"} and value.bookmark is not None
+        )
+        self.length = value.length
+        # offsets[p] is the first row of page p and bookmarks[p] where to
+        # fetch it from. The last entries refer to the next unknown page
+        head = value_rows(item.type, value.head)
+        # index addressed windows must be aligned with the first one
+        self.page_size = len(head) if self.random_access else page_size
+        self._offsets = [0, len(head)]
+        self._bookmarks = [None, value.bookmark]
+        self._pages = OrderedDict({0: head})
+        self._requests = {}
+
+    def close(self):
+        for request in self._requests.values():
+            request.cancel()
+        self._requests = {}
+
+    def base_count(self):
+        return self.length if self.random_access else self._offsets[-1]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.random_access:
+            return False
+        page = len(self._offsets) - 1
+        return self._bookmarks[page] is not None and page not in self._requests
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._fetch(len(self._offsets) - 1)
+
+    def base_row(self, row):
+        if self.random_access:
+            page = row // self.page_size
+            first = page * self.page_size
+            known = (self.length + self.page_size - 1) // self.page_size
+        else:
+            page = bisect.bisect_right(self._offsets, row) - 1
+            first = self._offsets[page]
+            known = len(self._offsets) - 1
+        rows = self._pages.get(page)
+        if rows is None:
+            self._fetch(page)
+            return None
+        self._pages.move_to_end(page)
+        # prefetch the following window once the view gets close to it
+        if row - first > len(rows) // 2 and page + 1 < known:
+            if page + 1 not in self._pages:
+                self._fetch(page + 1)
+        offset = row - first
+        return rows[offset] if offset < len(rows) else None
+
+    def _view_row(self, row):
+        return row + bisect.bisect_right(self._added_at, row)
+
+    def _fetch(self, page):
+        if page in self._requests:
+            return
+        if self.random_access:
+            bookmark = page * self.page_size
+        else:
+            bookmark = self._bookmarks[page]
+        item = self.item
+        self._requests[page] = item.redis.submit(
+            item.redis.page,
+            item.key,
+            item.type,
+            bookmark,
+            self.page_size,
+            callback=partial(self._on_page, page),
+        )
+
+    def _store(self, page, rows):
+        self._pages[page] = rows
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    def _on_page(self, page, result):
+        self._requests.pop(page, None)
+        rows, bookmark = result
+        last_column = len(self.header) - 1
+        if not self.random_access and page == len(self._offsets) - 1:
+            first = self._offsets[-1]
+            if rows:
+                first = self._view_row(first)
+                self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._offsets.append(self._offsets[-1] + len(rows))
+            self._bookmarks.append(bookmark)
+            self._store(page, rows)
+            if rows:
+                self.endInsertRows()
+            return
+        if self.random_access:
+            first = page * self.page_size
+            size = min(self.page_size, self.length - first)
+        else:
+            first = self._offsets[page]
+            size = self._offsets[page + 1] - first
+        # the value may have changed since the window was first seen
+        filler = ("",) * len(self.header)
+        rows = (list(rows) + [filler] * size)[:size]
+        self._store(page, rows)
+        if size:
+            self.dataChanged.emit(
+                self.index(self._view_row(first), 0),
+                self.index(self._view_row(first + size - 1), last_column),
+            )
+
 
 @ui_loadable
 class MultiEditor(QWidget):
@@ -28,77 +348,70 @@ class MultiEditor(QWidget):
         self.load_ui()
         self.modified = False
         self.item = None
-        self.ui.table.itemSelectionChanged.connect(self.__update)
-        self.ui.table.itemChanged.connect(self.__on_item_changed)
+        self.model = None
         self.ui.add_button.clicked.connect(self.__on_add_item)
         self.ui.delete_button.clicked.connect(self.__on_delete_selection)
         self.ui.revert_button.clicked.connect(self.__on_revert_changes)
 
-    def __on_item_changed(self, item):
-        self.modified = True
+    def __on_item_changed(self):
+        self.modified = self.model.is_modified()
         self.__update()
 
     def __on_revert_changes(self):
         self.set_item(self.item)
 
+    def __selected_rows(self):
+        selection = self.ui.table.selectionModel()
+        return {index.row() for index in selection.selectedIndexes()}
+
     def __on_add_item(self):
-        table = self.ui.table
-        items = table.selectedIndexes()
-        if items:
-            row = max([item.row() for item in items])
-        else:
-            row = table.rowCount()
-        table.insertRow(row)
-        key_item = QTableWidgetItem()
-        table.setItem(row, 0, key_item)
-        table.editItem(key_item)
-        self.modified = True
-        self.__update()
+        table, model = self.ui.table, self.model
+        rows = self.__selected_rows()
+        row = max(rows) if rows else model.rowCount()
+        model.insertRow(row)
+        table.edit(model.index(row, 0))
 
     def __on_delete_selection(self):
-        table = self.ui.table
-        rows = set([item.row() for item in table.selectedIndexes()])
-        for row in sorted(rows, reverse=True):
-            table.removeRow(row)
-        self.modified = True
-        self.__update()
+        for row in sorted(self.__selected_rows(), reverse=True):
+            self.model.removeRow(row)
 
     def __update(self):
         ui, modified = self.ui, self.modified
         style = ModifiedStyle if modified else ""
-        selected_count = len(ui.table.selectedIndexes())
         ui.table.setStyleSheet(style)
         ui.revert_button.setEnabled(modified)
-        ui.delete_button.setEnabled(selected_count > 0)
+        ui.delete_button.setEnabled(bool(self.__selected_rows()))
+
+    @property
+    def paged(self):
+        return isinstance(self.model, PagedValueModel)
 
     def get_item(self):
-        table, item = self.ui.table, self.item
-        if item.type in {"hash", "zset"}:
-            value = {}
-            for row in range(table.rowCount()):
-                value[table.item(row, 0).text()] = table.item(row, 1).text()
-        else:
-            value = [table.item(row, 0).text() for row in range(table.rowCount())]
-            value = value if item.type == "list" else set(value)
-        return item._replace(value=value)
+        """The item with the value edits as a ValueDiff"""
+        return self.item._replace(value=self.model.diff(self.item.type))
 
     def set_item(self, item):
         self.item = item
-        table = self.ui.table
-        table.clearContents()
         dtype, value = item.type, item.value
-        table.setRowCount(len(value))
-        header = ("Key", "Value") if dtype in {"hash", "zset"} else ("Value",)
-        table.setColumnCount(len(header))
-        table.setHorizontalHeaderLabels(header)
-        for row, key in enumerate(value):
-            table.setItem(row, 0, QTableWidgetItem(key))
-        if item.type in {"hash", "zset"}:
-            for row, (key, data) in enumerate(value.items()):
-                table.setItem(row, 1, QTableWidgetItem(data))
+        if isinstance(value, PagedValue):
+            model = PagedValueModel(item, parent=self)
+        else:
+            model = LoadedValueModel(dtype, value, parent=self)
+        model.edited.connect(self.__on_item_changed)
+        self.__set_model(model)
         self.modified = False
         self.__update()
 
+    def __set_model(self, model):
+        old_model = self.model
+        self.model = model
+        self.ui.table.setModel(model)
+        self.ui.table.selectionModel().selectionChanged.connect(self.__update)
+        if old_model is not None:
+            if isinstance(old_model, PagedValueModel):
+                old_model.close()
+            old_model.deleteLater()
+
 
 @ui_loadable
 class SimpleEditor(QWidget):
@@ -214,10 +527,60 @@ class RedisItemEditor(QWidget):
         item = self.__item._replace(value=item.value, ttl=item.ttl)
         if self.__original_item.key:
             self.__on_key_name_applied()
-        item.redis[item.key] = item.value
+        # the writes are queued on the I/O worker in order: the value is
+        # written after the rename and the refresh reads it back after both
+        redis = item.redis
+        if isinstance(item.value, ValueDiff):
+            redis.submit(
+                redis.apply,
+                item.key,
+                item.value,
+                watch=True,
+                callback=lambda _: self.__on_value_applied(item),
+                errback=partial(self.__on_apply_error, item),
+            )
+        elif not isinstance(item.value, PagedValue):
+            redis.submit(
+                redis.__setitem__,
+                item.key,
+                item.value,
+                callback=lambda _: self.__on_value_applied(item),
+                errback=partial(self.__on_apply_error, item),
+            )
+        else:
+            self.__on_value_applied(item)
+
+    def __on_value_applied(self, item):
+        if not self.__is_current(item.key):
+            return
         self.__on_ttl_applied()
-        self.set_item(item)
-        self.__update()
+        self.__original_item = item
+        self.__on_refresh()
+
+    def __on_apply_error(self, item, error):
+        if not isinstance(error, ConflictError):
+            logging.error("error applying changes to %r", item.key, exc_info=error)
+            QMessageBox.warning(self, "Error applying changes", repr(error))
+            return
+        result = QMessageBox.question(
+            self,
+            "Conflict",
+            "{!r} was modified by someone else since it was loaded.\n"
+            "Apply your changes anyway?".format(item.key),
+        )
+        if result != QMessageBox.Yes:
+            return
+        item.redis.submit(
+            item.redis.apply,
+            item.key,
+            item.value,
+            callback=lambda _: self.__on_value_applied(item),
+            errback=partial(self.__on_apply_error, item),
+        )
+
+    def __is_current(self, key):
+        # the selection may have moved on while a write was running
+        return self.__item is not None and self.__item.key == key
 
     def __on_key_name_changed(self, key):
         self.__item = self.__item._replace(key=key)
@@ -226,12 +589,18 @@ class RedisItemEditor(QWidget):
     def __on_key_name_applied(self):
         if self.name_modified:
             item, original_item = self.__item, self.__original_item
-            try:
-                if original_item.key:
-                    item.redis.rename(original_item.key, item.key)
-                    self.__original_item = original_item._replace(key=item.key)
-            except Exception:
-                logging.exception("error on key name applied callback")
+            if original_item.key:
+                item.redis.submit(
+                    item.redis.rename,
+                    original_item.key,
+                    item.key,
+                    callback=lambda _: self.__on_key_renamed(item.key),
+                    errback=partial(self.__on_write_error, "key name applied"),
+                )
+
+    def __on_key_renamed(self, key):
+        if self.__is_current(key):
+            self.__original_item = self.__original_item._replace(key=key)
             self.__update()
 
     def __on_ttl_changed(self, ttl):
@@ -241,37 +610,54 @@ class RedisItemEditor(QWidget):
 
     def __on_ttl_applied(self):
         if self.ttl_modified:
-            item, original_item = self.__item, self.__original_item
-            try:
-                item.redis.expire(item.key, item.ttl)
-                self.__original_item = original_item._replace(ttl=item.ttl)
-            except Exception:
-                logging.exception("error on ttl applied callback")
+            item = self.__item
+            item.redis.submit(
+                item.redis.expire,
+                item.key,
+                item.ttl,
+                callback=lambda _: self.__on_ttl_set(item.key, item.ttl),
+                errback=partial(self.__on_write_error, "ttl applied"),
+            )
+
+    def __on_ttl_set(self, key, ttl):
+        if self.__is_current(key):
+            self.__original_item = self.__original_item._replace(ttl=ttl)
             self.__update()
 
+    def __on_write_error(self, action, error):
+        logging.error("error on %s callback", action, exc_info=error)
+
     def __on_refresh(self):
         item = self.__original_item
-        if item is not None:
-            try:
-                item = item.redis[item.key]
-            except KeyError:
-                item = None
-        self.set_item(item)
+        if item is None:
+            self.set_item(item)
+        else:
+            item.redis.submit(
+                item.redis.get,
+                item.key,
+                page_size=PAGE_SIZE,
+                callback=self.set_item,
+                group="selection",
+            )
 
     def __on_undo(self):
         self.set_item(self.__original_item)
 
     def __on_persist(self):
-        try:
-            self.__original_item.redis.persist(self.__item.key)
-        except Exception:
-            logging.exception("error on persist applied callback")
+        redis = self.__original_item.redis
+        redis.submit(
+            redis.persist,
+            self.__item.key,
+            errback=partial(self.__on_write_error, "persist applied"),
+        )
 
     def __on_delete(self):
-        try:
-            self.__original_item.redis.delete(self.__item.key)
-        except Exception:
-            logging.exception("error on delete applied callback")
+        redis = self.__original_item.redis
+        redis.submit(
+            redis.delete,
+            self.__item.key,
+            errback=partial(self.__on_write_error, "delete applied"),
+        )
 
     def __update(self):
         ui = self.ui
@@ -370,11 +756,25 @@ class RedisDbEditor(QMainWindow):
 
     def set_db(self, redis):
         self._redis = redis
-        info = self._redis.info()
-        config = self._redis.config_get()
-        clients = self._redis.client_list()
-        name, tooltip = redis_str(redis)
+        redis.submit(
+            self._fetch_db, redis, callback=self._fill_db, group="selection"
+        )
+
+    @staticmethod
+    def _fetch_db(redis):
+        info = redis.info()
+        config = redis.config_get()
+        clients = redis.client_list()
+        # on a cluster they all come from a single node
+        node = redis.get_default_node().name if redis.is_cluster() else None
+        return info, config, clients, node, redis_str(redis)
+
+    def _fill_db(self, result):
+        info, config, clients, node, (name, tooltip) = result
         name = "{} (v{})".format(name, info["redis_version"])
+        if node is not None:
+            name += " - node {}".format(node)
+            tooltip += "\nInfo, config and clients of node {}".format(node)
         self.ui.name_label.setText(name)
         self.ui.name_label.setToolTip(tooltip)
 
@@ -427,34 +827,39 @@ class StreamViewer(QWidget):
         header = ("Key", "Value")
         self.ui.table.setColumnCount(len(header))
         self.ui.table.setHorizontalHeaderLabels(header)
-        self.ui.list.itemSelectionChanged.connect(self.select_item)
 
-    def select_item(self):
-        items = self.ui.list.selectedItems()
-        self.ui.table.clearContents()
-        if not items:
+    def select_item(self, *args):
+        table = self.ui.table
+        table.clearContents()
+        table.setRowCount(0)
+        index = self.ui.list.currentIndex()
+        event = self._events.row(index.row()) if index.isValid() else None
+        if event is None:
             return
-        item = items[0]
-        data = self._events[item.text()]
-        self.ui.table.setRowCount(len(data))
+        data = event[1]
+        table.setRowCount(len(data))
         for row, (key, value) in enumerate(data.items()):
-            self.ui.table.setItem(row, 0, QTableWidgetItem(key))
-            self.ui.table.setItem(row, 1, QTableWidgetItem(value))
-        self.ui.table.resizeColumnsToContents()
+            table.setItem(row, 0, QTableWidgetItem(key))
+            table.setItem(row, 1, QTableWidgetItem(value))
+        table.resizeColumnsToContents()
 
     def get_item(self):
         return self.item
 
     def set_item(self, item):
         self.item = item
-        self.ui.list.clear()
-        self.ui.table.clearContents()
-        self._events = OrderedDict()
-
-        for event in item.value:
-            self._events[event[0]] = event[1]
-            self.ui.list.addItem(event[0])
-        self.ui.list.setCurrentRow(0)
+        value = item.value
+        if not isinstance(value, PagedValue):
+            item = item._replace(value=PagedValue(value, len(value), None))
+        events, self._events = self._events, PagedValueModel(item, parent=self)
+        self.ui.list.setModel(self._events)
+        self.ui.list.selectionModel().currentChanged.connect(self.select_item)
+        self._events.dataChanged.connect(self.select_item)
+        if events is not None:
+            events.close()
+            events.deleteLater()
+        self.ui.list.setCurrentIndex(self._events.index(0, 0))
+        self.select_item()
 
 
 class RedisEditor(QWidget):
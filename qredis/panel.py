@@ -2,14 +2,14 @@ from qtpy.QtCore import Qt
 from qtpy.QtWidgets import QSplitter
 
 from .tree import RedisTree
-from .editor import RedisEditor
+from .editor import RedisEditor, PAGE_SIZE
 
 
 class RedisPanel(QSplitter):
-    def __init__(self, redis, parent=None):
+    def __init__(self, redis, parent=None, lazy=False):
         super(RedisPanel, self).__init__(parent)
         self.redis = redis
-        self.tree = RedisTree(redis, parent=self)
+        self.tree = RedisTree(redis, parent=self, lazy=lazy)
         self.editor = RedisEditor(self)
         self.tree.setWindowFlags(Qt.Widget)
         self.addWidget(self.tree)
@@ -24,9 +24,15 @@ class RedisPanel(QSplitter):
 
     def __on_selection_changed(self, node):
         if node is None:
+            self.redis.executor.cancel("selection")
             self.editor.set_empty()
         elif node.is_key():
-            item = self.redis.get(node.key)
-            self.editor.set_item(item)
+            self.redis.submit(
+                self.redis.get,
+                node.key,
+                page_size=PAGE_SIZE,
+                callback=self.editor.set_item,
+                group="selection",
+            )
         elif node.is_db():
             self.editor.set_db(self.redis)
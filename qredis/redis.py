@@ -1,62 +1,174 @@
-import pickle
+import time
+import uuid
+import logging
+import functools
+import itertools
 import collections
 
-import msgpack
-import msgpack_numpy
-from redis import Redis
-from qtpy.QtCore import QObject, Signal
+from redis import Redis, RedisCluster, WatchError, ResponseError
+from qtpy.QtCore import QObject, QTimer, Signal
 
-from .util import KeyItem
+from .util import (
+    KeyItem, KeySummary, PagedValue, redis_fetch, redis_page, redis_summary, human_size,
+    notifications_enabled, missing_notification_flags, glob_matcher,
+)
+from .codec import decode, TYPE_DECODES
+from .worker import RedisExecutor
+from .tracking import ClientCache
+from .dump import DumpWriter
+from .cluster import ClusterScanner
 
 
-def msgpack_pack(data):
-    return msgpack.packb(data, use_bin_type=True, default=msgpack_numpy.encode)
+def value_rows(dtype, value):
+    """Flatten a decoded collection value in a list of table rows"""
+    if dtype in {"hash", "zset"}:
+        return list(value.items())
+    elif dtype in {"list", "set"}:
+        return [(i,) for i in value]
+    return list(value)
 
 
-def msgpack_unpack(buff):
-    return msgpack.unpackb(buff, raw=False, object_hook=msgpack_numpy.decode)
+class ConflictError(Exception):
+    """The value was modified by someone else since it was read"""
 
 
-def decode_utf8(v):
-    return v.decode()
+ValueDiff = collections.namedtuple(
+    "ValueDiff", "type length originals changed deleted added"
+)
+ValueDiff.__doc__ = """\
+Edits made to a collection value, as rows (tuples) indexed by their
+position in the value as it was read:
 
+- length: number of rows the value had
+- originals: {row: original row} of every row touched below
+- changed: {row: new row}
+- deleted: set of deleted rows
+- added: list of (row, new row): new rows to insert before row (rows equal
+  to length are appended)"""
 
-def decode_pickle(v):
-    return str(pickle.loads(v))
+
+def _set(redis, key, value):
+    redis.set(key, value)
 
 
-def decode_msgpack(v):
-    return str(msgpack_unpack(v))
+def _set_hash(redis, key, hsh):
+    with redis.pipeline() as pipe:
+        pipe.delete(key)
+        if hsh:
+            pipe.hset(key, mapping=hsh)
+        pipe.execute()
 
 
-DECODES = [
-    (decode_utf8, "utf-8"),
-    (decode_pickle, "pickle"),
-    (decode_msgpack, "msgpack"),
-    (str, "raw"),
-]
+def _set_list(redis, key, lst):
+    with redis.pipeline() as pipe:
+        pipe.delete(key)
+        if lst:
+            pipe.rpush(key, *lst)
+        pipe.execute()
 
 
-def decode(value):
-    for decoder, dtype in DECODES:
-        try:
-            return decoder(value)
-        except Exception:
+def _set_set(redis, key, st):
+    with redis.pipeline() as pipe:
+        pipe.delete(key)
+        if st:
+            pipe.sadd(key, *tuple(st))
+        pipe.execute()
+
+
+def _diff_hash(pipe, key, diff):
+    removed = [diff.originals[row][0] for row in diff.deleted]
+    updated = {}
+    for row, (field, value) in diff.changed.items():
+        if row in diff.deleted:
+            continue
+        if field != diff.originals[row][0]:
+            removed.append(diff.originals[row][0])
+        updated[field] = value
+    for _, (field, value) in diff.added:
+        updated[field] = value
+    if removed:
+        pipe.hdel(key, *removed)
+    if updated:
+        pipe.hset(key, mapping=updated)
+
+
+def _diff_set(pipe, key, diff):
+    removed = [diff.originals[row][0] for row in diff.deleted | set(diff.changed)]
+    added = [row[0] for _, row in diff.added]
+    added += [new[0] for row, new in diff.changed.items() if row not in diff.deleted]
+    if removed:
+        pipe.srem(key, *removed)
+    if added:
+        pipe.sadd(key, *added)
+
+
+def _diff_zset(pipe, key, diff):
+    removed = [diff.originals[row][0] for row in diff.deleted]
+    scores = {}
+    for row, (member, score) in diff.changed.items():
+        if row in diff.deleted:
             continue
+        if member != diff.originals[row][0]:
+            removed.append(diff.originals[row][0])
+        scores[member] = float(score)
+    for _, (member, score) in diff.added:
+        scores[member] = float(score)
+    if removed:
+        pipe.zrem(key, *removed)
+    if scores:
+        pipe.zadd(key, scores)
+
+
+def _diff_list(pipe, key, diff):
+    # LREM and LINSERT work by value so rows to delete or to insert before
+    # are first overwritten with a unique marker (indexes are still the
+    # original ones at that point)
+    marker = "qredis:{}:".format(uuid.uuid4().hex)
+    anchored = collections.defaultdict(list)
+    for row, (value,) in diff.added:
+        anchored[row].append(value)
+    markers = set(diff.deleted) | {row for row in anchored if row < diff.length}
+    for row, (value,) in diff.changed.items():
+        if row not in markers:
+            pipe.lset(key, row, value)
+    for row in markers:
+        pipe.lset(key, row, marker + str(row))
+    for row, values in sorted(anchored.items()):
+        if row < diff.length:
+            for value in values:
+                pipe.linsert(key, "BEFORE", marker + str(row), value)
+        else:
+            pipe.rpush(key, *values)
+    for row in markers:
+        if row not in diff.deleted:
+            value = diff.changed.get(row, diff.originals[row])[0]
+            pipe.linsert(key, "BEFORE", marker + str(row), value)
+        pipe.lrem(key, 1, marker + str(row))
 
 
-def _set(redis, key, value):
-    redis.set(key, value)
+def _expect_hash(pipe, key, diff):
+    for field, _ in diff.originals.values():
+        pipe.hget(key, field)
+    return [value for _, value in diff.originals.values()]
 
 
-def _set_list(redis, key, lst):
-    redis.delete(key)
-    redis.rpush(key, *lst)
+def _expect_set(pipe, key, diff):
+    for (member,) in diff.originals.values():
+        pipe.sismember(key, member)
+    return [True] * len(diff.originals)
 
 
-def _set_set(redis, key, st):
-    redis.delete(key)
-    redis.sadd(key, *tuple(st))
+def _expect_zset(pipe, key, diff):
+    for member, _ in diff.originals.values():
+        pipe.zscore(key, member)
+    return [float(score) for _, score in diff.originals.values()]
+
+
+def _expect_list(pipe, key, diff):
+    pipe.llen(key)
+    for row in diff.originals:
+        pipe.lindex(key, row)
+    return [diff.length] + [value for (value,) in diff.originals.values()]
 
 
 class zset(list):
@@ -69,8 +181,9 @@ class stream(tuple):
 
 class QRedis(QObject):
 
-    keyRenamed = Signal(object, object)
-    keysDeleted = Signal()
+    keysAdded = Signal(object)
+    keysDeleted = Signal(object)
+    keyRenamed = Signal(str, str)
 
     TYPE_MAP = {
         type(None): "none",
@@ -87,34 +200,66 @@ class QRedis(QObject):
             parent, args = args[0], args[1:]
         else:
             parent = kwargs.pop("parent", None)
+        # max memory (bytes) of the client side cache of values
+        client_cache = kwargs.pop("client_cache", None)
+        # connect to a redis cluster (through any of its nodes)
+        cluster = kwargs.pop("cluster", False)
         # kwargs.setdefault("decode_responses", True)
         super(QRedis, self).__init__(parent)
 
-        self._get_type_map = {
-            "none": lambda v: None,
-            "string": self._get,
-            "hash": self._hgetall,
-            "list": self._lgetall,
-            "set": self._sgetall,
-            "zset": self._zgetall,
-            "stream": self._xrange,
-        }
+        self._decode_type_map = dict(TYPE_DECODES)
 
         self._set_type_map = collections.defaultdict(
-            lambda: lambda r, k, v: _set(r.redis, k, v),
+            lambda: lambda k, v: _set(self.redis, k, v),
             {
                 type(None): lambda k, v: self.delete(k),
-                dict: lambda k, v: self.redis.hmset(k, v),
+                dict: lambda k, v: _set_hash(self.redis, k, v),
                 list: lambda k, v: _set_list(self.redis, k, v),
                 set: lambda k, v: _set_set(self.redis, k, v),
+                ValueDiff: lambda k, v: self.apply(k, v),
             },
         )
 
-        self.redis = Redis(*args, **kwargs)
+        self._diff_type_map = {
+            "hash": _diff_hash,
+            "list": _diff_list,
+            "set": _diff_set,
+            "zset": _diff_zset,
+        }
+
+        self._expect_type_map = {
+            "hash": _expect_hash,
+            "list": _expect_list,
+            "set": _expect_set,
+            "zset": _expect_zset,
+        }
+
+        self.scanner = None
+        if cluster:
+            if client_cache:
+                raise ValueError("the client side cache is not available on clusters")
+            # clusters only have db 0
+            kwargs.pop("db", None)
+            self.redis = RedisCluster(*args, **kwargs)
+            self.scanner = ClusterScanner(self.redis)
+            self.destroyed.connect(self.scanner.close)
+        else:
+            self.redis = Redis(*args, **kwargs)
+        self.executor = RedisExecutor(self)
+        self.metadata = KeyMetadata(self, parent=self)
+        self.cache = None
+        if client_cache:
+            self.cache = ClientCache(self.redis, max_memory=client_cache)
+            self.cache.start()
+            self.destroyed.connect(self.cache.stop)
 
     def __getattr__(self, name):
         return getattr(self.redis, name)
 
+    def submit(self, func, *args, **kwargs):
+        """Run func(*args) on the I/O worker thread (see RedisExecutor.submit)"""
+        return self.executor.submit(func, *args, **kwargs)
+
     def __getitem__(self, key):
         value = self.get(key)
         if value is None:
@@ -122,65 +267,600 @@ class QRedis(QObject):
         return value
 
     def __setitem__(self, key, value):
-
-        self._set_type_map[type(value)](self, key, value)
+        self._set_type_map[type(value)](key, value)
+        # apply() announces the key itself
+        if value is not None and not isinstance(value, ValueDiff):
+            self.keysAdded.emit((key,))
 
     def __delitem__(self, key):
         self.delete(key)
 
-    def _get(self, key):
-        return decode(self.redis.get(key))
-
-    def _hgetall(self, key):
-        return {decode(k): decode(v) for k, v in self.redis.hgetall(key).items()}
-
-    def _lgetall(self, key):
-        return [decode(i) for i in self.redis.lrange(key, 0, -1)]
-
-    def _sgetall(self, key):
-        return {decode(i) for i in self.redis.smembers(key)}
-
-    def _zgetall(self, key):
-        return {
-            decode(member): decode(score)
-            for member, score in self.redis.zscan_iter(key)
-        }
-
-    def _xrange(self, key):
-        data = []
-        for i in self.redis.xrange(key):
-            event_time, event_data_raw = i
-            event_time = decode(event_time)
-            event_data = {
-                decode(member): decode(score)
-                for member, score in event_data_raw.items()
-            }
-            data.append((event_time, event_data))
-        return data
-    
-    def get(self, key, default=None):
-        if not self.exists(key):
+    def get(self, key, default=None, page_size=None):
+        """
+        Returns the KeyItem of the given key or default if it doesn't exist.
+
+        With *page_size*, collections bigger than it are not fetched in full:
+        the item value is a PagedValue holding the first window. The rest
+        can be read with :meth:`page`.
+
+        With the client side cache on, items of keys which didn't change
+        since they were last read come from the cache (their TTL is the one
+        at that time).
+        """
+        cache = self.cache
+        cache = cache if cache is not None and cache.enabled else None
+        if cache is not None:
+            item = cache.get(key, page_size)
+            if item is not None:
+                return item
+            stamp = cache.stamp()
+        fetched = redis_fetch(self.redis, key, page_size)
+        if fetched is None:
             return default
-        dtype, ttl = self.type(key), self.ttl(key)
-        ttl = -1 if ttl is None else ttl  # handle redis < 2.8
-        value = self._get_type_map[dtype](key)
-        return KeyItem(self, key, dtype, ttl, value)
+        dtype, ttl, value, length, bookmark = fetched
+        if dtype in self._decode_type_map:
+            value = self._decode_type_map[dtype](value, key)
+        if bookmark is not None:
+            value = PagedValue(value, length, bookmark)
+        item = KeyItem(self, key, dtype, ttl, value)
+        if cache is not None:
+            cache.put(key, page_size, item, stamp)
+        return item
+
+    def page(self, key, dtype, bookmark=None, count=1000):
+        """
+        Returns one window of rows of a collection value and the bookmark
+        of the next window (see :func:`qredis.util.redis_page`).
+        """
+        items, bookmark = redis_page(self.redis, key, dtype, bookmark, count)
+        return value_rows(dtype, self._decode_type_map[dtype](items, key)), bookmark
+
+    def apply(self, key, diff, watch=False):
+        """
+        Apply a ValueDiff to a collection with the minimum set of commands
+        (HSET/HDEL, SADD/SREM, ZADD/ZREM, LSET/LINSERT/LREM) in a single
+        MULTI/EXEC transaction.
+
+        With *watch*, the key is WATCHed and the touched elements are checked
+        to still hold the values they were read with. ConflictError is raised
+        if the value was modified by someone else in the meantime.
+
+        Emits keysAdded (or keysDeleted if the diff emptied the collection).
+        """
+        with self.redis.pipeline(transaction=True) as pipe:
+            if watch:
+                pipe.watch(key)
+                # anything changing after WATCH makes EXEC fail anyway so the
+                # check doesn't need to run on the watching connection
+                check = self.redis.pipeline(transaction=False)
+                expected = self._expect_type_map[diff.type](check, key, diff)
+                current = [
+                    decode(i, key) if isinstance(i, bytes) else i for i in check.execute()
+                ]
+                if current != expected:
+                    raise ConflictError(key)
+                pipe.multi()
+            self._diff_type_map[diff.type](pipe, key, diff)
+            pipe.exists(key)
+            try:
+                exists = pipe.execute()[-1]
+            except WatchError:
+                raise ConflictError(key)
+        if exists:
+            self.keysAdded.emit((key,))
+        else:
+            self.keysDeleted.emit((key,))
 
     def type(self, name):
         return self.redis.type(name).decode()
 
-    def keys(self, pattern):
-        return [k.decode() for k in self.redis.keys(pattern)]
+    def is_cluster(self):
+        return self.scanner is not None
+
+    def dbsize(self):
+        """Number of keys, of all the primaries on a cluster"""
+        if self.scanner is not None:
+            return self.redis.dbsize(target_nodes=RedisCluster.PRIMARIES)
+        return self.redis.dbsize()
+
+    def keys(self, pattern="*"):
+        if self.scanner is None:
+            return [k.decode() for k in self.redis.scan_iter(pattern)]
+        cursor, keys = self.scan(match=pattern)
+        while cursor:
+            cursor, more = self.scan(cursor, match=pattern)
+            keys.extend(more)
+        return keys
+
+    def scan(self, cursor=0, match="*", count=None):
+        """
+        One SCAN step. On a cluster all the primaries are scanned at once
+        and the cursor is a qredis.cluster.ClusterCursor (false once done)
+        """
+        if self.scanner is not None:
+            cursor, keys = self.scanner.scan(cursor, match=match, count=count)
+            return cursor, [k.decode() for k in keys]
+        cursor, keys = self.redis.scan(cursor=cursor, match=match, count=count)
+        return int(cursor), [k.decode() for k in keys]
 
     def has_key(self, key):
         return self.exists(key)
 
     def delete(self, *keys):
         self.redis.delete(*keys)
-        self.keysDeleted.emit()
+        self.keysDeleted.emit(keys)
 
     def rename(self, old_key, new_key):
-        old_item = self[old_key]
         self.redis.rename(old_key, new_key)
-        new_item = self[new_key]
-        self.keyRenamed.emit(old_item, new_item)
+        self.keyRenamed.emit(old_key, new_key)
+
+
+class BulkOperation(QObject):
+    """
+    Runs a command on many keys without blocking the GUI nor the server.
+
+    The keys are given explicitly and/or as SCAN MATCH *patterns* (ex: a
+    folder prefix), optionally restricted to the ones matching the glob
+    *filter*. They are processed *chunk* keys at a time, one round trip per
+    chunk on the I/O worker, so other requests interleave and cancel() stops
+    at the next chunk:
+
+    - delete: UNLINK (DEL on redis < 4) of each chunk, the memory is freed
+      by the server in the background
+    - touch: TOUCH of each chunk
+    - persist, expire (args: seconds): one command per key, pipelined
+
+    progress(done) is emitted after each chunk and finished() at the end
+    (also after cancel() or an error).
+    """
+
+    progress = Signal(int)
+    finished = Signal()
+    error = Signal(object)
+
+    COMMANDS = ("delete", "touch", "persist", "expire")
+
+    def __init__(
+        self, qredis, command, keys=(), patterns=(), args=(), filter=None,
+        chunk=1000, parent=None
+    ):
+        super(BulkOperation, self).__init__(parent)
+        if command not in self.COMMANDS:
+            raise ValueError("unsupported bulk command {!r}".format(command))
+        self.qredis = qredis
+        self.command = command
+        self.args = args
+        self.filter = filter
+        self._match = None if filter is None else glob_matcher(filter)
+        self.patterns = tuple(patterns)
+        self.chunk = chunk
+        # number of explicit keys (pattern matches are only known once done)
+        self.total = len(keys)
+        self.done = 0
+        self._keys = iter(keys)
+        self._patterns = collections.deque(self.patterns)
+        self._cursor = 0
+        self._request = None
+        self._running = False
+        self.started = None
+
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        self._running = True
+        self.started = time.monotonic()
+        self._next()
+
+    def status(self):
+        return "{}: {} keys".format(self.command, self.done)
+
+    def cancel(self):
+        if self._request is not None:
+            self._request.cancel()
+            self._request = None
+        if self._running:
+            self._running = False
+            self.finished.emit()
+
+    def _next(self):
+        keys = list(itertools.islice(self._keys, self.chunk))
+        if keys:
+            self._request = self.qredis.submit(
+                self._run, keys, callback=self._on_chunk, errback=self._on_error
+            )
+        elif self._patterns:
+            self._request = self.qredis.submit(
+                self._scan_run,
+                self._patterns[0],
+                self._cursor,
+                callback=self._on_chunk,
+                errback=self._on_error,
+            )
+        else:
+            self._request = None
+            self._running = False
+            self.finished.emit()
+
+    # run on the I/O worker
+
+    def _scan_run(self, pattern, cursor):
+        cursor, keys = self.qredis.scan(cursor, match=pattern, count=self.chunk)
+        if self.filter is not None:
+            keys = [key for key in keys if self._match(key)]
+        return self._run(keys), cursor
+
+    def _run(self, keys):
+        if not keys:
+            return keys
+        redis = self.qredis.redis
+        if self.command == "delete":
+            try:
+                redis.unlink(*keys)
+            except ResponseError:
+                # redis < 4
+                redis.delete(*keys)
+            self.qredis.keysDeleted.emit(keys)
+        elif self.command == "touch":
+            redis.touch(*keys)
+        else:
+            pipe = redis.pipeline(transaction=False)
+            command = getattr(pipe, self.command)
+            for key in keys:
+                command(key, *self.args)
+            pipe.execute()
+        return keys
+
+    def _on_chunk(self, result):
+        if isinstance(result, tuple):
+            keys, cursor = result
+            self._cursor = cursor
+            if not cursor:
+                self._patterns.popleft()
+        else:
+            keys = result
+        self.done += len(keys)
+        self.progress.emit(self.done)
+        if self._running:
+            self._next()
+
+    def _on_error(self, error):
+        logging.error("error running bulk %s", self.command, exc_info=error)
+        self._request = None
+        self._running = False
+        self.error.emit(error)
+        self.finished.emit()
+
+
+class ExportOperation(BulkOperation):
+    """
+    Exports keys (explicit and/or matching SCAN patterns, like any
+    BulkOperation) to a dump file (see :mod:`qredis.dump`).
+
+    DUMP and PTTL are pipelined and the records streamed to the file on
+    the I/O worker. Keys are dumped in batches sized from the payloads seen
+    so far to keep the ones held in memory around *max_bytes* (the first
+    batch is small as sizes are not known yet). The file is created right
+    away.
+    """
+
+    COMMANDS = ("export",)
+
+    def __init__(
+        self, qredis, path, keys=(), patterns=(), compress=None, filter=None,
+        chunk=1000, max_bytes=16 * 1024 * 1024, parent=None
+    ):
+        super(ExportOperation, self).__init__(
+            qredis, "export", keys, patterns, filter=filter, chunk=chunk, parent=parent
+        )
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch = min(chunk, 16)
+        self.writer = DumpWriter(path, compress)
+        self.finished.connect(self._close)
+
+    def rate(self):
+        """Bytes exported per second"""
+        if self.started is None:
+            return 0
+        elapsed = time.monotonic() - self.started
+        return self.writer.size / elapsed if elapsed > 0 else 0
+
+    def status(self):
+        return "export: {} keys, {} ({}/s)".format(
+            self.done, human_size(self.writer.size), human_size(self.rate())
+        )
+
+    def _run(self, keys):
+        exported, start, size, count = [], 0, 0, 0
+        while start < len(keys):
+            batch = keys[start:start + self.batch]
+            start += len(batch)
+            pipe = self.qredis.redis.pipeline(transaction=False)
+            for key in batch:
+                pipe.dump(key)
+                pipe.pttl(key)
+            results = pipe.execute()
+            for key, payload, pttl in zip(batch, results[::2], results[1::2]):
+                if payload is None:
+                    # removed in the meantime
+                    continue
+                self.writer.write(key, payload, pttl if pttl >= 0 else -1)
+                exported.append(key)
+                size += len(payload)
+                count += 1
+            del results
+            if count:
+                self.batch = max(1, min(self.chunk, int(self.max_bytes * count / size)))
+        return exported
+
+    def _close(self):
+        # after the chunk being written, if any
+        self.qredis.submit(self.writer.close)
+
+
+class NotificationsDisabled(Exception):
+    """The server doesn't publish keyspace notifications"""
+
+
+class KeyspaceMonitor(QObject):
+    """
+    Follows the keys written and removed in the database of a QRedis
+    through keyspace notifications, on a dedicated pubsub connection.
+
+    Events are queued by the pubsub thread and delivered on the GUI
+    thread every *interval* ms as keysChanged(added, removed), keeping only
+    the last event of each key so bursts don't flood the views.
+
+    The server must publish keyevent (E) or keyspace (K) notifications of
+    all classes (A, or g$lshzxe): with only some of them, writes of the other
+    types would be missed (see notify-keyspace-events).
+    """
+
+    keysChanged = Signal(object, object)
+    error = Signal(object)
+
+    REMOVED = {"del", "expired", "evicted", "rename_from", "move_from"}
+
+    def __init__(self, qredis, interval=250, parent=None):
+        super(KeyspaceMonitor, self).__init__(parent)
+        self.qredis = qredis
+        self._events = collections.deque()
+        self._running = False
+        self._thread = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._flush)
+        self.error.connect(self._on_error)
+
+    def flags(self):
+        config = self.qredis.redis.config_get("notify-keyspace-events")
+        return config.get("notify-keyspace-events", "")
+
+    def enable_notifications(self):
+        """Make the server publish the notifications needed"""
+        flags = self.flags()
+        missing = missing_notification_flags(flags)
+        if missing:
+            self.qredis.redis.config_set("notify-keyspace-events", flags + missing)
+
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        """
+        Subscribe and start delivering changes. Runs the subscription on the
+        I/O worker: NotificationsDisabled or connection errors are reported
+        through the error signal.
+        """
+        if self._running:
+            return
+        if self.qredis.is_cluster():
+            # notifications are published by each node for its own keys
+            logging.warning("live updates are not available on clusters")
+            return
+        self._running = True
+        self.qredis.submit(
+            self._subscribe, callback=self._on_subscribed, errback=self.error.emit
+        )
+
+    def stop(self):
+        self._running = False
+        self._timer.stop()
+        self._events.clear()
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+
+    def _subscribe(self):
+        redis = self.qredis.redis
+        db = redis.connection_pool.connection_kwargs.get("db", 0)
+        flags = self.flags()
+        if not notifications_enabled(flags):
+            raise NotificationsDisabled(flags)
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        if "E" in flags:
+            pubsub.psubscribe(**{f"__keyevent@{db}__:*": self._on_keyevent})
+        else:
+            pubsub.psubscribe(**{f"__keyspace@{db}__:*": self._on_keyspace})
+        return pubsub.run_in_thread(
+            sleep_time=0.1, daemon=True, exception_handler=self._on_thread_error
+        )
+
+    def _on_subscribed(self, thread):
+        if not self._running:
+            # stopped while subscribing
+            thread.stop()
+            return
+        self._thread = thread
+        self._timer.start()
+
+    def _on_thread_error(self, error, pubsub, thread):
+        thread.stop()
+        self.error.emit(error)
+
+    def _on_error(self, error):
+        if not isinstance(error, NotificationsDisabled):
+            logging.error("keyspace notifications stopped", exc_info=error)
+        self.stop()
+
+    # called from the pubsub thread
+
+    def _on_keyevent(self, message):
+        event = message["channel"].split(b":", 1)[1]
+        self._events.append((message["data"], event))
+
+    def _on_keyspace(self, message):
+        key = message["channel"].split(b":", 1)[1]
+        self._events.append((key, message["data"]))
+
+    def _flush(self):
+        events, pop = {}, self._events.popleft
+        for _ in range(len(self._events)):
+            key, event = pop()
+            events[key] = event
+        if not events:
+            return
+        added, removed = [], []
+        for key, event in events.items():
+            keys = removed if event.decode() in self.REMOVED else added
+            keys.append(key.decode())
+        self.keysChanged.emit(added, removed)
+
+
+class KeyMetadata(QObject):
+    """
+    Cache of key summaries (type, TTL, length, memory usage and first few
+    elements, see :class:`qredis.util.KeySummary`) for views which only
+    describe keys, like tooltips, and must not read whole values.
+
+    get() only answers from the cache. Keys missing or expired are queued
+    and fetched together, up to *batch* keys per pipeline, on the I/O
+    worker. They are announced with updated(keys) (keys which no longer
+    exist included). Entries expire *ttl* seconds after being fetched and
+    the least recently used ones are dropped beyond *max_keys*. Keys written
+    or removed through the QRedis are dropped right away and announced with
+    invalidated(keys) too so views can fetch the ones they still show.
+    """
+
+    updated = Signal(object)
+    invalidated = Signal(object)
+
+    def __init__(self, qredis, ttl=5, max_keys=10000, head=5, batch=500, parent=None):
+        super(KeyMetadata, self).__init__(parent)
+        self.qredis = qredis
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.head = head
+        self.batch = batch
+        # key: (expiration time, KeySummary), least recently used first
+        self._cache = collections.OrderedDict()
+        # keys to fetch (a dict keeps them in request order) and being fetched
+        self._pending = {}
+        self._fetching = set()
+        qredis.keysAdded.connect(self.invalidate)
+        qredis.keysDeleted.connect(self.invalidate)
+        qredis.keyRenamed.connect(self._on_renamed)
+
+    def get(self, key):
+        """
+        The KeySummary of a key or None if it is not known yet. An expired
+        summary is still returned while a fresh one is being fetched.
+        """
+        entry = self._cache.get(key)
+        if entry is None:
+            self.request((key,))
+            return None
+        expires, summary = entry
+        self._cache.move_to_end(key)
+        if expires <= time.monotonic():
+            self.request((key,))
+        return summary
+
+    def peek(self, key):
+        """The cached KeySummary of a key (even expired) or None, without
+        fetching anything"""
+        entry = self._cache.get(key)
+        return None if entry is None else entry[1]
+
+    def prefetch(self, keys):
+        """Fetch the keys which are not cached or expired"""
+        now, missing = time.monotonic(), []
+        for key in keys:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] <= now:
+                missing.append(key)
+            else:
+                self._cache.move_to_end(key)
+        self.request(missing)
+
+    def request(self, keys):
+        """Schedule the keys to be fetched (not already being fetched)"""
+        schedule = not self._pending
+        for key in keys:
+            if key not in self._fetching:
+                self._pending[key] = None
+        if schedule and self._pending:
+            # gather the requests of this event loop iteration
+            QTimer.singleShot(0, self._flush)
+
+    def invalidate(self, keys):
+        dropped = []
+        for key in keys:
+            self._fetching.discard(key)
+            if self._cache.pop(key, None) is not None:
+                dropped.append(key)
+        if dropped:
+            self.updated.emit(dropped)
+            self.invalidated.emit(dropped)
+
+    def _on_renamed(self, old_key, new_key):
+        self.invalidate((old_key, new_key))
+
+    def clear(self):
+        self._cache.clear()
+        self._pending.clear()
+        self._fetching.clear()
+
+    def _flush(self):
+        keys, self._pending = list(self._pending), {}
+        self._fetching.update(keys)
+        for start in range(0, len(keys), self.batch):
+            batch = keys[start:start + self.batch]
+            self.qredis.submit(
+                self._fetch,
+                batch,
+                callback=functools.partial(self._on_fetched, batch),
+                errback=functools.partial(self._on_error, batch),
+            )
+
+    def _fetch(self, keys):
+        decoders = self.qredis._decode_type_map
+        summaries = redis_summary(self.qredis.redis, keys, self.head)
+        return {
+            key: KeySummary(key, dtype, ttl, length, memory, decoders[dtype](head, key))
+            for key, (dtype, ttl, length, memory, head) in summaries.items()
+        }
+
+    def _on_fetched(self, keys, summaries):
+        expires, updated = time.monotonic() + self.ttl, []
+        for key in keys:
+            if key not in self._fetching:
+                # invalidated in the meantime
+                continue
+            self._fetching.discard(key)
+            summary = summaries.get(key)
+            if summary is None:
+                self._cache.pop(key, None)
+            else:
+                self._cache[key] = expires, summary
+                self._cache.move_to_end(key)
+            updated.append(key)
+        while len(self._cache) > self.max_keys:
+            self._cache.popitem(last=False)
+        if updated:
+            self.updated.emit(updated)
+
+    def _on_error(self, keys, error):
+        logging.error("error fetching the metadata of %d keys", len(keys), exc_info=error)
+        self._fetching.difference_update(keys)
@@ -0,0 +1,237 @@
+import sys
+import logging
+import threading
+import collections
+
+import redis.connection
+from redis import Redis, ConnectionPool, RedisError
+
+from .util import PagedValue
+
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+def value_size(value):
+    """Rough estimate of the memory used by a decoded value, in bytes"""
+    if isinstance(value, PagedValue):
+        value = value.head
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(value_size(k) + value_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(value_size(i) for i in value)
+    return size
+
+
+class ClientCache:
+    """
+    Client side cache of the decoded KeyItems of a redis client, kept
+    coherent by redis (>= 6) server-assisted client side caching.
+
+    A dedicated connection subscribes to the invalidation channel and every
+    connection of the client pool turns CLIENT TRACKING on, redirecting the
+    invalidation messages to it: the server then tells as soon as a key read
+    through the client is modified, expires or is evicted (or the database
+    is flushed) and the cached items of the key are dropped.
+
+    Items are kept in a LRU bounded by an estimate of their size
+    (*max_memory* bytes). Call :meth:`start` before the client opens
+    connections: the ones in use at that time would not be tracked.
+
+    The cache fails safe: if the invalidation connection is lost or a
+    connection can't turn tracking on, it is cleared and disabled.
+    """
+
+    def __init__(self, redis, max_memory=64 * 1024 * 1024, history=1024):
+        self.redis = redis
+        self.max_memory = max_memory
+        self.enabled = False
+        self.client_id = None
+        self.hits = 0
+        self.misses = 0
+        self.memory = 0
+        # (key, page size): (KeyItem, size), least recently used first
+        self._items = collections.OrderedDict()
+        self._page_sizes = collections.defaultdict(set)
+        # invalidation counter and last invalidated keys (None: all of them)
+        # to tell if a key changed while it was being read
+        self._version = 0
+        self._recent = collections.deque(maxlen=history)
+        self._lock = threading.RLock()
+        self._listener = None
+        self._thread = None
+
+    def start(self):
+        pool = self.redis.connection_pool
+        kwargs = dict(pool.connection_kwargs)
+        kwargs.pop("redis_connect_func", None)
+        self._listener = Redis(
+            connection_pool=ConnectionPool(
+                connection_class=self._listener_class(pool), max_connections=1, **kwargs
+            )
+        )
+        # the pubsub gets the same (single) connection
+        self.client_id = self._listener.client_id()
+        pubsub = self._listener.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATE_CHANNEL: self._on_invalidate})
+        pubsub.connection.register_connect_callback(self._on_listener_reconnect)
+        self._thread = pubsub.run_in_thread(
+            sleep_time=0.1, daemon=True, exception_handler=self._on_listener_error
+        )
+        self.enabled = True
+        pool.connection_kwargs["redis_connect_func"] = self._on_connect
+        self._reset_connections(pool)
+
+    def stop(self):
+        self.disable()
+        self.redis.connection_pool.connection_kwargs.pop("redis_connect_func", None)
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._listener is not None:
+            self._listener.connection_pool.disconnect()
+            self._listener = None
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._page_sizes.clear()
+            self.memory = 0
+
+    def stamp(self):
+        """To be taken before reading a key and given back to :meth:`put`"""
+        return self._version
+
+    def get(self, key, page_size=None):
+        with self._lock:
+            entry = self._items.get((key, page_size))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end((key, page_size))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, page_size, item, stamp):
+        """Cache an item read since *stamp* unless the key was invalidated
+        in the meantime"""
+        size = value_size(item.value)
+        with self._lock:
+            if not self.enabled or size > self.max_memory:
+                return
+            if stamp != self._version and self._changed_since(key, stamp):
+                return
+            self._drop((key, page_size))
+            self._items[key, page_size] = item, size
+            self._page_sizes[key].add(page_size)
+            self.memory += size
+            while self.memory > self.max_memory:
+                self._drop(next(iter(self._items)))
+
+    def invalidate(self, keys):
+        """Drop the given keys (all of them if None)"""
+        with self._lock:
+            self._version += 1
+            if keys is None:
+                self._recent.append((self._version, None))
+                self.clear()
+                return
+            for key in keys:
+                self._recent.append((self._version, key))
+                for page_size in self._page_sizes.pop(key, ()):
+                    _, size = self._items.pop((key, page_size))
+                    self.memory -= size
+
+    def _changed_since(self, key, stamp):
+        if not self._recent or self._recent[0][0] > stamp + 1:
+            # the history doesn't go back that far
+            return True
+        return any(
+            version > stamp and name in (key, None) for version, name in self._recent
+        )
+
+    def _drop(self, entry_key):
+        entry = self._items.pop(entry_key, None)
+        if entry is None:
+            return
+        self.memory -= entry[1]
+        key, page_size = entry_key
+        page_sizes = self._page_sizes[key]
+        page_sizes.discard(page_size)
+        if not page_sizes:
+            del self._page_sizes[key]
+
+    def _listener_class(self, pool):
+        return pool.connection_class
+
+    def _reset_connections(self, pool):
+        # idle connections were opened before tracking was on
+        pool.disconnect(inuse_connections=False)
+
+    def _on_connect(self, connection):
+        connection.on_connect()
+        if self.enabled:
+            self._track(connection)
+
+    def _track(self, connection):
+        try:
+            connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", self.client_id)
+            connection.read_response()
+        except RedisError:
+            logging.exception("could not turn key tracking on, client cache disabled")
+            self.disable()
+
+    def _on_invalidate(self, message):
+        keys = message["data"]
+        if keys is not None:
+            if isinstance(keys, bytes):
+                keys = [keys]
+            keys = [key.decode(errors="replace") for key in keys]
+        self.invalidate(keys)
+
+    def _on_listener_reconnect(self, connection):
+        # the redirections point to the id of the lost connection
+        logging.warning("key invalidation connection lost, client cache disabled")
+        self.disable()
+
+    def _on_listener_error(self, error, pubsub, thread):
+        logging.error("key invalidation connection lost, client cache disabled", exc_info=error)
+        thread.stop()
+        self.disable()
+
+
+class AsyncClientCache(ClientCache):
+    """
+    ClientCache of a redis.asyncio client (ex: qredis_web). Its connections
+    turn tracking on as they connect; the invalidation connection is a
+    regular one listening in its own thread.
+
+    Call :meth:`start` before the client sends its first command.
+    """
+
+    def _listener_class(self, pool):
+        # same transport (TCP, TLS or unix socket) as the client
+        return getattr(redis.connection, pool.connection_class.__name__)
+
+    def _reset_connections(self, pool):
+        # the pool can't be disconnected outside of the event loop
+        pass
+
+    async def _on_connect(self, connection):
+        await connection.on_connect()
+        if self.enabled:
+            await self._track(connection)
+
+    async def _track(self, connection):
+        try:
+            await connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", self.client_id)
+            await connection.read_response()
+        except RedisError:
+            logging.exception("could not turn key tracking on, client cache disabled")
+            self.disable()
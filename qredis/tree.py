@@ -1,22 +1,36 @@
 import os
+import re
+import sys
+import random
+import bisect
 import logging
+import itertools
 import functools
+import collections
 
 from qtpy.QtCore import (
-    Qt, Signal, QModelIndex, QAbstractItemModel, QSortFilterProxyModel)
-from qtpy.QtGui import QIcon
+    Qt, Signal, QObject, QModelIndex, QAbstractItemModel, QSortFilterProxyModel,
+    QTimer, QEvent, QPoint)
+from qtpy.QtGui import QIcon, QColor, QCursor
 from qtpy.QtWidgets import (
     QMainWindow,
+    QHeaderView,
     QApplication,
     QToolButton,
     QMessageBox,
     QInputDialog,
     QMenu,
+    QProgressBar,
+    QToolTip,
+    QFileDialog,
 )
 
-from .util import KeyItem as Item, redis_str
+from .util import KeyItem as Item, redis_str, redis_sample, human_size, glob_matcher
 from .qutil import ui_loadable
-from .redis import QRedis
+from .redis import (
+    QRedis, KeyspaceMonitor, NotificationsDisabled, BulkOperation, ExportOperation
+)
+from .worker import Request
 
 
 _this_dir = os.path.dirname(__file__)
@@ -28,31 +42,165 @@ _folder_icon = os.path.join(_res_dir, "folder.png")
 NodeRole = Qt.UserRole
 KeyNameRole = Qt.UserRole + 1
 
+# extra columns of the key model while the key metadata is shown and while
+# a keyspace analysis is shown (Memory is shared: key memory usage for keys,
+# analysis estimate for folders)
+METADATA_COLUMNS = ("Type", "TTL", "Length", "Memory")
+ANALYSIS_COLUMNS = ("Keys", "Memory", "Expiring")
+_COLUMN_ROLES = {
+    Qt.DisplayRole, Qt.ToolTipRole, Qt.TextAlignmentRole, Qt.BackgroundRole
+}
+
 
 class Node:
-    __slots__ = ["name", "full_name", "key", "parent", "children", "items"]
+    """
+    A folder and/or a key of the tree.
 
-    def __init__(self, name, full_name, key=None, parent=None, children=None):
-        self.name = name
-        self.full_name = full_name
-        self.key = key
+    There is one node per key and folder so they are kept small: names are
+    interned (the same segments repeat all over a keyspace), the children
+    are two parallel lists sorted by name (names, for bisection, and nodes)
+    allocated only for folders and the full name (which is also the key
+    name) is rebuilt from the path when asked.
+    """
+
+    __slots__ = [
+        "name",
+        "parent",
+        "items",
+        "nodes",
+        "keyed",
+        "generation",
+        "row",
+        "dirty",
+        "misses",
+    ]
+
+    def __init__(self, name, parent=None, key=False):
+        self.name = None if name is None else sys.intern(name)
         self.parent = parent
-        self.children = children or {}
-        self.items = list(self.children)
+        self.items = None
+        self.nodes = None
+        self.keyed = key
+        # refresh in which the key was last seen
+        self.generation = 0
+        # position in the parent items and first of the children whose
+        # row is out of date (None if all are up to date)
+        self.row = 0
+        self.dirty = None
+        self.misses = 0
+
+    @property
+    def full_name(self):
+        names, node = [], self
+        while not node.is_db():
+            names.append(node.name)
+            node = node.parent
+        return node.separator.join(reversed(names))
+
+    @property
+    def key(self):
+        return self.full_name if self.keyed else None
+
+    @key.setter
+    def key(self, key):
+        self.keyed = key is not None
+
+    @property
+    def children(self):
+        return self.nodes or ()
+
+    def _invalidate(self, row):
+        if row < len(self) and (self.dirty is None or row < self.dirty):
+            self.dirty = row
+
+    def child_row(self, node):
+        """
+        Row of the given child.
+
+        Inserting or removing a child doesn't renumber its siblings right
+        away: until then the rows of the ones that follow are found by
+        bisection and they are renumbered once the lookups have cost about
+        as much as renumbering them.
+        """
+        dirty = self.dirty
+        if dirty is None or node.row < dirty:
+            return node.row
+        items = self.items
+        self.misses += 1
+        if self.misses * 32 < len(items) - dirty:
+            return bisect.bisect_left(items, node.name)
+        nodes = self.nodes
+        for row in range(dirty, len(nodes)):
+            nodes[row].row = row
+        self.dirty, self.misses = None, 0
+        return node.row
+
+    def bisect(self, name):
+        """Row at which a child with the given name keeps items sorted"""
+        return bisect.bisect_left(self.items, name) if self.items else 0
 
-    def __setitem__(self, name, node):
-        self.children[name] = node
-        self.items.append(name)
+    def child(self, name):
+        """The child with the given name or None"""
+        items = self.items
+        if items:
+            row = bisect.bisect_left(items, name)
+            if row < len(items) and items[row] == name:
+                return self.nodes[row]
+
+    def insert(self, row, node):
+        if self.nodes is None:
+            self.items, self.nodes = [], []
+        node.parent = self
+        node.row = row
+        self.items.insert(row, node.name)
+        self.nodes.insert(row, node)
+        self._invalidate(row)
+
+    def remove(self, row):
+        del self.items[row]
+        node = self.nodes.pop(row)
+        node.parent = None
+        if self.nodes:
+            self._invalidate(row)
+        else:
+            self.clear()
+        return node
+
+    def find(self, parts):
+        """The descendant at the given path or None"""
+        node = self
+        for part in parts:
+            node = node.child(part)
+            if node is None:
+                break
+        return node
+
+    def clear(self):
+        self.items = self.nodes = None
+        self.dirty, self.misses = None, 0
+
+    def walk(self):
+        """This node and all its descendants"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children)
+
+    def walk_keys(self):
+        """All key nodes of this subtree"""
+        return (node for node in self.walk() if node.keyed)
 
     def __getitem__(self, name_or_index):
         if isinstance(name_or_index, int):
-            name = self.items[name_or_index]
-        else:
-            name = name_or_index
-        return self.children[name]
+            return self.children[name_or_index]
+        node = self.child(name_or_index)
+        if node is None:
+            raise KeyError(name_or_index)
+        return node
 
     def __len__(self):
-        return len(self.children)
+        return len(self.nodes) if self.nodes else 0
 
     def __repr__(self):
         if self.is_key():
@@ -64,15 +212,30 @@ class Node:
         return False
 
     def is_key(self):
-        return self.key is not None
+        return self.keyed
 
     def key_item(self, redis):
         if self.is_key():
             return redis.get(self.key)
 
+    def key_summary(self, redis):
+        """The cached KeySummary of the key (fetched in the background if
+        missing, see :class:`qredis.redis.KeyMetadata`)"""
+        if self.is_key():
+            return redis.metadata.get(self.key)
+
 
 class RedisNode(Node):
 
+    # plain attributes instead of the path based properties
+    full_name = None
+    separator = None
+
+    def __init__(self, name, full_name, separator, parent=None):
+        super(RedisNode, self).__init__(name, parent=parent)
+        self.full_name = full_name
+        self.separator = separator
+
     def is_db(self):
         return True
 
@@ -80,47 +243,739 @@ class RedisNode(Node):
         return f"Redis(name={self.name})"
 
 
+_GLOB = re.compile(r"([\\*?\[\]])")
+
+
+def glob_escape(text):
+    """Escape the redis glob-style pattern special characters"""
+    return _GLOB.sub(r"\\\1", text)
+
+
+def glob_prefix(pattern):
+    """The prefix matched by a "prefix*" glob pattern or None"""
+    if pattern.endswith("*") and not _GLOB.search(pattern[:-1]):
+        return pattern[:-1]
+
+
 def tree(redis, keys, sep):
     name, long_name = redis_str(redis)
-    root = Node(None, None)
-    rnode = RedisNode(name, long_name, parent=root)
+    root = Node(None)
+    rnode = RedisNode(name, long_name, sep)
     rnode.redis = redis
-    root[name] = rnode
+    root.insert(0, rnode)
     for key in keys:
-        parts = key.split(sep)
         parent = rnode
-        partial = []
-        for part in parts:
-            partial.append(part)
-            try:
-                node = parent[part]
-            except KeyError:
-                full_name = sep.join(partial)
-                node = Node(part, full_name, parent=parent)
-                parent[part] = node
+        for part in key.split(sep):
+            node = parent.child(part)
+            if node is None:
+                node = Node(part)
+                parent.insert(parent.bisect(part), node)
             parent = node
         node.key = key
     return root
 
 
+class KeyStats:
+    """Statistics of the keys sampled in a folder (and its sub-folders)"""
+
+    __slots__ = ["count", "memory", "types", "ttls"]
+
+    # upper bounds (seconds) of the TTL distribution buckets. ttls[0] counts
+    # the keys without expiration and ttls[-1] the ones beyond the last bound
+    TTL_BOUNDS = (60, 3600, 86400)
+    TTL_LABELS = ("no expiration", "< 1 min", "< 1 hour", "< 1 day", ">= 1 day")
+
+    def __init__(self):
+        self.count = 0
+        self.memory = 0
+        self.types = {}
+        self.ttls = [0] * len(self.TTL_LABELS)
+
+    def add(self, dtype, memory, ttl):
+        self.count += 1
+        if memory is not None:
+            self.memory += memory
+        self.types[dtype] = self.types.get(dtype, 0) + 1
+        if ttl < 0:
+            self.ttls[0] += 1
+        else:
+            self.ttls[1 + bisect.bisect_right(self.TTL_BOUNDS, ttl)] += 1
+
+    @property
+    def expiring(self):
+        return self.count - self.ttls[0]
+
+    def __repr__(self):
+        return f"KeyStats(count={self.count}, memory={self.memory})"
+
+
+class KeyspaceAnalysis(QObject):
+    """
+    Samples the database in the background to tell which folders hold the
+    keys and the memory.
+
+    The database is SCANned *count* keys at a time and a fraction *rate*
+    of them is picked at random. TYPE, MEMORY USAGE and PTTL of the picked
+    keys are pipelined (see :func:`qredis.util.redis_sample`) and their
+    statistics are added to every folder of their path (split by *sep*),
+    stats[()] being the whole database. Batches are *interval* ms apart so
+    a low rate and a long interval keep the load on a production server
+    negligible.
+
+    Counts and memory are sampled values: multiply by :attr:`scale` to
+    estimate the real ones.
+    """
+
+    updated = Signal(object)
+    progress = Signal(int, int)
+    finished = Signal()
+
+    def __init__(
+        self, qredis, sep=":", rate=0.1, samples=None, count=1000, interval=50,
+        parent=None
+    ):
+        super(KeyspaceAnalysis, self).__init__(parent)
+        self.qredis = qredis
+        self.separator = sep
+        self.rate = rate
+        self.samples = samples
+        self.count = count
+        self.stats = {}
+        self.scanned = 0
+        self.sampled = 0
+        # MEMORY USAGE answered for at least one key
+        self.has_memory = False
+        self._request = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._next)
+        self._cursor = None
+
+    @property
+    def scale(self):
+        return 1 / self.rate
+
+    def is_running(self):
+        return self._cursor is not None
+
+    def start(self):
+        self.stop()
+        self.stats, self.scanned, self.sampled = {(): KeyStats()}, 0, 0
+        self.has_memory = False
+        self._cursor = 0
+        self._next()
+
+    def stop(self):
+        self._timer.stop()
+        if self._request is not None:
+            self._request.cancel()
+            self._request = None
+        self._cursor = None
+
+    def _next(self):
+        self._request = self.qredis.submit(
+            self._sample_batch,
+            self._cursor,
+            callback=self._on_batch,
+            errback=self._on_error,
+        )
+
+    def _sample_batch(self, cursor):
+        # runs on the I/O worker
+        cursor, keys = self.qredis.scan(cursor, count=self.count)
+        rate, rand = self.rate, random.random
+        picked = keys if rate >= 1 else [key for key in keys if rand() < rate]
+        return cursor, len(keys), redis_sample(self.qredis.redis, picked, self.samples)
+
+    def _on_batch(self, result):
+        cursor, scanned, sampled = result
+        stats, sep, touched = self.stats, self.separator, set()
+        for key, dtype, memory, ttl in sampled:
+            if memory is not None:
+                self.has_memory = True
+            path = tuple(key.split(sep)[:-1])
+            for i in range(len(path) + 1):
+                folder = path[:i]
+                folder_stats = stats.get(folder)
+                if folder_stats is None:
+                    stats[folder] = folder_stats = KeyStats()
+                folder_stats.add(dtype, memory, ttl)
+                touched.add(folder)
+        self.scanned += scanned
+        self.sampled += len(sampled)
+        self._request = None
+        self._cursor = cursor or None
+        if touched:
+            self.updated.emit(touched)
+        self.progress.emit(self.scanned, self.sampled)
+        if cursor:
+            self._timer.start()
+        else:
+            self.finished.emit()
+
+    def _on_error(self, error):
+        logging.error("error analysing the keyspace", exc_info=error)
+        self._request = self._cursor = None
+        self.finished.emit()
+
+
 class RedisKeyModel(QAbstractItemModel):
+    """
+    Tree of the database keys split by *sep*.
+
+    By default the whole database is scanned up front (or *keys* are loaded
+    instead, the first time). With *lazy* only
+    the folders being expanded are scanned (SCAN MATCH folder<sep>*) and
+    their children are kept only while it fits *max_nodes*: beyond that
+    the least recently used collapsed folders are unloaded (and scanned
+    again when expanded).
+    """
 
-    def __init__(self, qredis, filter="*", sep=":"):
+    loadStarted = Signal()
+    loadProgress = Signal(int, int)
+    loadFinished = Signal()
+
+    def __init__(
+        self, qredis, filter="*", sep=":", scan_count=1000, lazy=False,
+        max_nodes=100000, keys=None
+    ):
         super().__init__()
         self.qredis = qredis
         self.filter = filter
+        self._match = glob_matcher(filter)
         self.separator = sep
+        self.scan_count = scan_count
+        self.lazy = lazy
+        self.max_nodes = max_nodes
+        # lazy mode: folders whose children were not scanned, the ones
+        # being scanned, the loaded ones (least recently used first) and the
+        # ones expanded in the view
+        self._unfetched = set()
+        self._fetching = {}
+        self._fetched = collections.OrderedDict()
+        self._expanded = set()
+        self._node_count = 0
         self._key_icon = QIcon(_key_icon)
         self._redis_icon = QIcon(_redis_icon)
         self._folder_icon = QIcon(_folder_icon)
-        self._refresh()
+        self._cursor = None
+        self._scan_request = None
+        self._keys = None
+        self._generation = 0
+        self.loaded = 0
+        self.total = 0
+        # the tree holds all the keys of the last complete scan
+        self.complete = False
+        # KeyspaceAnalysis shown in the extra columns
+        self.analysis = None
+        # show the key metadata columns
+        self.metadata_shown = False
+        self._columns = ("Key",)
+        self._new_tree()
+        qredis.keysAdded.connect(self._on_keys_added)
+        qredis.keysDeleted.connect(self.remove_keys)
+        qredis.keyRenamed.connect(self._on_key_renamed)
+        qredis.metadata.updated.connect(self._on_metadata_updated)
+        self._load(keys)
+
+    def _new_tree(self):
+        for request in self._fetching.values():
+            request.cancel()
+        self._unfetched.clear()
+        self._fetching.clear()
+        self._fetched.clear()
+        self._expanded.clear()
+        self._node_count = 0
+        self.tree = tree(self.qredis, (), self.separator)
+        if self.lazy:
+            self._unfetched.add(self.tree[0])
+
+    def _load(self, keys=None):
+        self.cancel_load()
+        self._generation += 1
+        self.complete = False
+        if self.lazy:
+            # rescan the loaded folders only
+            for node in list(self._fetched):
+                self._fetch_branch(node)
+            return
+        self._cursor, self.loaded, self.total = 0, 0, 0
+        self._keys = None if keys is None else iter(keys)
+        if keys is None:
+            self.qredis.submit(self.qredis.dbsize, callback=self._on_total)
+        self._scan_next()
+        self.loadStarted.emit()
+
+    def _scan_next(self):
+        if self._keys is not None:
+            # feed the keys in batches between GUI events
+            self._scan_request = request = Request(self._feed_next, (), {})
+            QTimer.singleShot(0, functools.partial(self._feed_next, request))
+            return
+        self._scan_request = self.qredis.submit(
+            self.qredis.scan,
+            self._cursor,
+            match=self.filter,
+            count=self.scan_count,
+            callback=self._on_scan_batch,
+            errback=self._on_scan_error,
+        )
+
+    def _feed_next(self, request):
+        if not request.cancelled:
+            keys = list(itertools.islice(self._keys, self.scan_count))
+            self._on_scan_batch((1 if keys else 0, keys))
+
+    def _on_total(self, total):
+        self.total = total
+        self.loadProgress.emit(self.loaded, self.total)
+
+    def _on_scan_batch(self, result):
+        cursor, keys = result
+        self.add_keys(keys)
+        self._cursor = cursor
+        self.loaded += len(keys)
+        self.loadProgress.emit(self.loaded, self.total)
+        if cursor:
+            self._scan_next()
+        else:
+            self._remove_stale_keys()
+            self.complete = True
+            self._finish_load()
+
+    def _on_scan_error(self, error):
+        logging.error("error scanning keys", exc_info=error)
+        self._finish_load()
+
+    def _finish_load(self):
+        self._cursor = None
+        self._scan_request = None
+        self._keys = None
+        self.loadFinished.emit()
+
+    def is_loading(self):
+        return self._cursor is not None
+
+    def cancel_load(self):
+        if self.is_loading():
+            self._scan_request.cancel()
+            self._finish_load()
+
+    def _remove_stale_keys(self):
+        """Remove the keys which were not seen by the last complete scan"""
+        generation = self._generation
+        stale = [
+            node.key for node in self.tree[0].walk_keys()
+            if node.generation != generation
+        ]
+        self.remove_keys(stale)
+
+    # lazy mode
+
+    def _prefix(self, node):
+        return "" if node.is_db() else node.full_name + self.separator
+
+    def _fetch_branch(self, node, cursor=0):
+        previous = self._fetching.get(node)
+        if previous is not None and not cursor:
+            previous.cancel()
+        match = glob_escape(self._prefix(node)) + "*"
+        self._fetching[node] = self.qredis.submit(
+            self.qredis.scan,
+            cursor,
+            match=match,
+            count=self.scan_count,
+            callback=functools.partial(self._on_branch_batch, node),
+            errback=functools.partial(self._on_branch_error, node),
+        )
+
+    def _on_branch_batch(self, node, result):
+        cursor, keys = result
+        if node.parent is None:
+            # removed while scanning
+            self._fetching.pop(node, None)
+            return
+        prefix, sep = self._prefix(node), self.separator
+        start = len(prefix)
+        if self.filter != "*":
+            keys = [key for key in keys if self._match(key)]
+        for key in keys:
+            name, folder, _ = key[start:].partition(sep)
+            self._add_child(node, name, None if folder else key, bool(folder))
+        if cursor:
+            self._fetch_branch(node, cursor)
+            return
+        del self._fetching[node]
+        self._unfetched.discard(node)
+        if node in self._fetched:
+            # refresh: drop the children which were not seen again
+            generation = self._generation
+            for child in list(node.children):
+                if child.generation != generation:
+                    self._remove_row(node, node.bisect(child.name))
+        self._fetched[node] = None
+        self._fetched.move_to_end(node)
+        self._evict()
+
+    def _on_branch_error(self, node, error):
+        logging.error("error scanning %r", self._prefix(node), exc_info=error)
+        self._fetching.pop(node, None)
+
+    def _add_child(self, parent, name, key, folder):
+        node = parent.child(name)
+        if node is None:
+            node = Node(name)
+            row = parent.bisect(name)
+            self.beginInsertRows(self._index(parent), row, row)
+            parent.insert(row, node)
+            self._node_count += 1
+            if folder:
+                self._unfetched.add(node)
+            self.endInsertRows()
+        elif folder and not len(node) and node not in self._fetched:
+            # a key which is also a folder
+            self._unfetched.add(node)
+        node.generation = self._generation
+        if key is not None and not node.is_key():
+            node.key = key
+            index = self._index(node)
+            self.dataChanged.emit(index, index)
+
+    def _is_loaded(self, node):
+        return node in self._fetched or node in self._fetching
+
+    def _evict(self):
+        """Unload the least recently used collapsed folders while there are
+        more than max_nodes"""
+        for node in list(self._fetched):
+            if self._node_count <= self.max_nodes:
+                break
+            if node not in self._fetched or node in self._expanded:
+                continue
+            if node.is_db() or node in self._fetching:
+                continue
+            self._unload(node)
+
+    def _unload(self, node):
+        if len(node):
+            self.beginRemoveRows(self._index(node), 0, len(node) - 1)
+            for child in node.children:
+                child.parent = None
+                self._forget(child)
+            node.clear()
+            self.endRemoveRows()
+        self._fetched.pop(node, None)
+        self._unfetched.add(node)
+
+    def _forget(self, node):
+        """Drop the lazy mode state of a subtree removed from the tree"""
+        for node in node.walk():
+            request = self._fetching.pop(node, None)
+            if request is not None:
+                request.cancel()
+            self._fetched.pop(node, None)
+            self._unfetched.discard(node)
+            self._expanded.discard(node)
+            self._node_count -= 1
+
+    def set_expanded(self, index, expanded):
+        """Tell which folders are expanded in the view: collapsed ones may
+        be unloaded"""
+        node = index.internalPointer()
+        if node is None:
+            return
+        if expanded:
+            self._expanded.add(node)
+            if node in self._fetched:
+                self._fetched.move_to_end(node)
+        else:
+            self._expanded.discard(node)
+            self._evict()
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.tree) > 0
+        return self.may_have_children(parent.internalPointer())
+
+    def may_have_children(self, node):
+        """the node has children or they were not fetched yet (lazy mode)"""
+        return len(node) > 0 or node in self._unfetched
+
+    def canFetchMore(self, parent):
+        if not parent.isValid():
+            return False
+        node = parent.internalPointer()
+        return node in self._unfetched and node not in self._fetching
+
+    def fetchMore(self, parent):
+        if self.canFetchMore(parent):
+            self._fetch_branch(parent.internalPointer())
+
+    def match_keys(self, pattern):
+        """
+        The keys of the tree matching the given glob pattern. "prefix*"
+        patterns only walk the branches starting with the prefix.
+        """
+        db, sep = self.tree[0], self.separator
+        prefix = glob_prefix(pattern)
+        if prefix is None:
+            match = glob_matcher(pattern)
+            return (node.key for node in db.walk_keys() if match(node.key))
+        *folders, start = prefix.split(sep)
+        parent = db.find(folders)
+        if parent is None or not len(parent):
+            return []
+        first = parent.bisect(start)
+        last = bisect.bisect_left(parent.items, start + "\U0010ffff", first)
+        branches = parent.children[first:last]
+        return (
+            node.key for branch in branches for node in branch.walk_keys()
+        )
+
+    def change_keys(self, added, removed):
+        self.qredis.metadata.invalidate(itertools.chain(added, removed))
+        if self.filter != "*":
+            added = [key for key in added if self._match(key)]
+        self.remove_keys(removed)
+        self.add_keys(added)
+
+    def _on_keys_added(self, keys):
+        self.change_keys(keys, ())
 
-    def _refresh(self):
-        keys = sorted(self.qredis.keys(self.filter))
-        self.tree = tree(self.qredis, keys, self.separator)
+    def _on_key_renamed(self, old_key, new_key):
+        self.change_keys((new_key,), (old_key,))
+
+    def _index(self, node):
+        parent = node.parent
+        if parent is None:
+            return QModelIndex()
+        return self.createIndex(parent.child_row(node), 0, node)
+
+    def add_keys(self, keys):
+        db = self.tree[0]
+        for key in keys:
+            self._add_key(db, key)
+
+    def _add_key(self, parent, key):
+        sep = self.separator
+        parts = key.split(sep)
+        for i, part in enumerate(parts):
+            if self.lazy and not self._is_loaded(parent):
+                # will be found when the folder gets scanned
+                if not len(parent) and not parent.is_db():
+                    self._unfetched.add(parent)
+                return
+            node = parent.child(part)
+            if node is None:
+                break
+            parent = node
+        else:
+            # SCAN may repeat keys and a folder may also be a key
+            parent.generation = self._generation
+            if not parent.is_key():
+                parent.key = key
+                index = self._index(parent)
+                self.dataChanged.emit(index, index)
+            return
+        if self.lazy:
+            self._add_child(parent, part, key if i == len(parts) - 1 else None,
+                            i < len(parts) - 1)
+            return
+        # build the missing branch detached so it is announced in one insert
+        branch = node = Node(part)
+        for j in range(i + 1, len(parts)):
+            child = Node(parts[j])
+            node.insert(len(node), child)
+            node = child
+        node.key = key
+        node.generation = self._generation
+        row = parent.bisect(part)
+        self.beginInsertRows(self._index(parent), row, row)
+        parent.insert(row, branch)
+        self.endInsertRows()
+
+    def remove_keys(self, keys):
+        db = self.tree[0]
+        for key in keys:
+            self._remove_key(db, key)
+
+    def _remove_key(self, db, key):
+        node = db.find(key.split(self.separator))
+        if node is None or not node.is_key():
+            return
+        if len(node):
+            # still a folder of other keys
+            node.key = None
+            index = self._index(node)
+            self.dataChanged.emit(index, index)
+            return
+        # drop the folders left empty along with the key
+        parent = node.parent
+        while parent is not db and len(parent) == 1 and not parent.is_key():
+            node, parent = parent, parent.parent
+        self._remove_row(parent, parent.bisect(node.name))
+
+    def _remove_row(self, parent, row):
+        self.beginRemoveRows(self._index(parent), row, row)
+        self._forget(parent.remove(row))
+        self.endRemoveRows()
+
+    # extra columns
+
+    def _update_columns(self):
+        columns = ["Key"]
+        if self.metadata_shown:
+            columns.extend(METADATA_COLUMNS)
+        if self.analysis is not None:
+            columns.extend(name for name in ANALYSIS_COLUMNS if name not in columns)
+        columns = tuple(columns)
+        if columns == self._columns:
+            return
+        if len(self._columns) > 1:
+            self.beginRemoveColumns(QModelIndex(), 1, len(self._columns) - 1)
+            self._columns = ("Key",)
+            self.endRemoveColumns()
+        if len(columns) > 1:
+            self.beginInsertColumns(QModelIndex(), 1, len(columns) - 1)
+            self._columns = columns
+            self.endInsertColumns()
+        # the columns of every folder changed, not only the ones of the root
+        # announced above: make proxies drop their mappings of the folders
+        self.layoutAboutToBeChanged.emit()
+        self.layoutChanged.emit()
+
+    def _column_data(self, node, name, role):
+        if self.analysis is not None and (name not in METADATA_COLUMNS or not node.is_key()):
+            return self._analysis_data(node, name, role)
+        if name in METADATA_COLUMNS and node.is_key():
+            return self._metadata_data(node, name, role)
+
+    # key metadata
+
+    def set_metadata(self, shown):
+        """Show the type, TTL, length and memory usage of the keys (as far
+        as cached by qredis.metadata, see :class:`MetadataPrefetcher`)"""
+        self.metadata_shown = shown
+        self._update_columns()
+
+    def _on_metadata_updated(self, keys):
+        if not self.metadata_shown:
+            return
+        db, last = self.tree[0], len(self._columns) - 1
+        for key in keys:
+            node = db.find(key.split(self.separator))
+            if node is None or not node.is_key():
+                continue
+            row = node.parent.child_row(node)
+            self.dataChanged.emit(
+                self.createIndex(row, 1, node), self.createIndex(row, last, node)
+            )
+
+    def _metadata_data(self, node, name, role):
+        summary = self.qredis.metadata.peek(node.key)
+        if summary is None:
+            return
+        if role == Qt.DisplayRole:
+            if name == "Type":
+                return summary.type
+            elif name == "TTL":
+                return "" if summary.ttl < 0 else str(summary.ttl)
+            elif name == "Length":
+                return str(summary.length)
+            elif name == "Memory":
+                return "?" if summary.memory is None else human_size(summary.memory)
+        elif role == Qt.ToolTipRole:
+            return summary.toolTip()
+        elif role == Qt.TextAlignmentRole and name != "Type":
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+
+    # keyspace analysis
+
+    def set_analysis(self, analysis):
+        """Show the statistics of a KeyspaceAnalysis (or None) in extra
+        columns"""
+        previous = self.analysis
+        if previous is analysis:
+            return
+        if previous is not None:
+            previous.updated.disconnect(self._on_analysis_updated)
+        self.analysis = analysis
+        self._update_columns()
+        if analysis is not None:
+            analysis.updated.connect(self._on_analysis_updated)
+
+    def _path(self, node):
+        names = []
+        while not node.is_db():
+            names.append(node.name)
+            node = node.parent
+        return tuple(reversed(names))
+
+    def _on_analysis_updated(self, folders):
+        # the shares of memory change for all the children of the folders
+        db, last = self.tree[0], len(self._columns) - 1
+        for folder in folders:
+            node = db.find(folder)
+            if node is None or not len(node):
+                continue
+            nodes = node.children
+            self.dataChanged.emit(
+                self.createIndex(0, 0, nodes[0]),
+                self.createIndex(len(nodes) - 1, last, nodes[-1]),
+            )
+        self.dataChanged.emit(self.createIndex(0, 0, db), self.createIndex(0, last, db))
+
+    def _analysis_data(self, node, name, role):
+        analysis = self.analysis
+        if not len(node) and node not in self._unfetched:
+            # keys: the statistics are kept per folder
+            return
+        stats = analysis.stats.get(self._path(node))
+        if stats is None or not stats.count:
+            return
+        if role == Qt.BackgroundRole:
+            # memory heatmap: share of the parent folder memory
+            if node.is_db() or not analysis.has_memory:
+                return
+            parent = analysis.stats.get(self._path(node.parent))
+            if parent is not None and parent.memory:
+                return QColor(255, 64, 0, int(160 * stats.memory / parent.memory))
+            return
+        sampled = analysis.rate < 1
+        if role == Qt.DisplayRole:
+            estimate = "~" if sampled else ""
+            if name == "Keys":
+                return "{}{}".format(estimate, round(stats.count * analysis.scale))
+            elif name == "Memory":
+                if not analysis.has_memory:
+                    return "?"
+                return estimate + human_size(stats.memory * analysis.scale)
+            elif name == "Expiring":
+                return "{:.0%}".format(stats.expiring / stats.count)
+            return
+        elif role == Qt.ToolTipRole:
+            if name in {"Expiring", "TTL"}:
+                lines = (
+                    "{}: {:.0%}".format(label, n / stats.count)
+                    for label, n in zip(KeyStats.TTL_LABELS, stats.ttls) if n
+                )
+            else:
+                types = sorted(stats.types.items(), key=lambda item: -item[1])
+                lines = ("{}: {:.0%}".format(t, n / stats.count) for t, n in types)
+            header = "{} keys sampled".format(stats.count)
+            if sampled:
+                header += " ({:g}% of the keys)".format(100 * analysis.rate)
+            return "\n".join((header, *lines))
+        elif role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self._columns[section]
 
     def columnCount(self, parent=QModelIndex()):
-        return 1
+        return len(self._columns)
 
     def rowCount(self, parent=QModelIndex()):
         if parent.isValid():
@@ -130,6 +985,14 @@ class RedisKeyModel(QAbstractItemModel):
             return len(self.tree)
 
     def data(self, index, role=Qt.DisplayRole):
+        column = index.column()
+        if column:
+            if role in _COLUMN_ROLES:
+                return self._column_data(index.internalPointer(), self._columns[column], role)
+            elif role not in {NodeRole, KeyNameRole}:
+                return
+        elif role == Qt.BackgroundRole and self.analysis is not None:
+            return self._analysis_data(index.internalPointer(), "Key", role)
         if role in {Qt.DisplayRole, Qt.AccessibleTextRole}:
             return index.internalPointer().name
         elif role == Qt.DecorationRole:
@@ -143,8 +1006,8 @@ class RedisKeyModel(QAbstractItemModel):
         elif role == Qt.ToolTipRole:
             node = index.internalPointer()
             if node.is_key():
-                key_item = node.key_item(self.qredis)
-                return "?" if key_item is None else key_item.toolTip()
+                summary = node.key_summary(self.qredis)
+                return "{}\n...".format(node.key) if summary is None else summary.toolTip()
             else:
                 return node.full_name
         elif role == NodeRole:
@@ -158,9 +1021,11 @@ class RedisKeyModel(QAbstractItemModel):
                 return node.key
 
     def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
         if parent.isValid():
             parent_node = parent.internalPointer()
-            node = parent_node[row - 1]
+            node = parent_node[row]
         else:
             node = self.tree[row]
         return self.createIndex(row, column, node)
@@ -169,52 +1034,156 @@ class RedisKeyModel(QAbstractItemModel):
         node = index.internalPointer()
         if node is None:
             return QModelIndex()
-        parent = node.parent
-        grandparent = parent.parent
-        if grandparent is None:
-            return QModelIndex()
-        row = grandparent.items.index(parent.name)
-        return self.createIndex(row, 0, parent)
+        return self._index(node.parent)
 
     def flags(self, index):
         if not index.isValid():
             return Qt.NoItemFlags
         node = index.internalPointer()
         value = Qt.ItemIsEnabled
-        if node.is_key():
+        if index.column():
+            return value
+        if not node.is_db():
+            # folders are selectable to act on all their keys
             value |= Qt.ItemIsSelectable
+        if node.is_key():
             value |= Qt.ItemIsEditable | Qt.ItemIsDragEnabled
         return value
 
-    def refresh(self):
+    def refresh(self, reset=False):
+        """
+        Scan the database again. Keys are added and removed in place so
+        the expanded branches stay expanded. With *reset* the tree is
+        rebuilt from scratch instead.
+        """
+        if not reset:
+            self._load()
+            return
         self.beginResetModel()
         try:
-            self._refresh()
+            self.cancel_load()
+            self._new_tree()
+            self._load()
         finally:
             self.endResetModel()
 
 
+class MetadataPrefetcher(QObject):
+    """
+    Fetches the metadata (see :class:`qredis.redis.KeyMetadata`) of the keys
+    shown by a tree view once scrolling settles: the visible rows plus
+    *overscan* pages above and below. Browsing a huge tree only costs the
+    rows actually looked at and rows still cached are not fetched again.
+
+    The rows are fetched again when their keys are invalidated and, as
+    long as they stay on screen, when their metadata expires.
+    """
+
+    def __init__(self, view, metadata, overscan=1, delay=100, parent=None):
+        super(MetadataPrefetcher, self).__init__(parent)
+        self.view = view
+        self.metadata = metadata
+        self.overscan = overscan
+        self.enabled = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._prefetch)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(int(metadata.ttl * 1000))
+        self._refresh_timer.timeout.connect(self._prefetch)
+        metadata.invalidated.connect(self.schedule)
+        view.verticalScrollBar().valueChanged.connect(self.schedule)
+        view.expanded.connect(self.schedule)
+        view.collapsed.connect(self.schedule)
+        model = view.model()
+        model.rowsInserted.connect(self.schedule)
+        model.layoutChanged.connect(self.schedule)
+        model.modelReset.connect(self.schedule)
+        view.viewport().installEventFilter(self)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.schedule()
+            self._refresh_timer.start()
+        else:
+            self._timer.stop()
+            self._refresh_timer.stop()
+
+    def schedule(self, *args):
+        if self.enabled:
+            self._timer.start()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Resize:
+            self.schedule()
+        return False
+
+    def visible_keys(self):
+        view = self.view
+        height = view.viewport().height()
+        first = view.indexAt(QPoint(0, 0))
+        indexes, index = [], first
+        while index.isValid() and view.visualRect(index).top() < height:
+            indexes.append(index)
+            index = view.indexBelow(index)
+        margin = len(indexes) * self.overscan
+        for _ in range(margin):
+            if not index.isValid():
+                break
+            indexes.append(index)
+            index = view.indexBelow(index)
+        index = view.indexAbove(first) if first.isValid() else first
+        for _ in range(margin):
+            if not index.isValid():
+                break
+            indexes.append(index)
+            index = view.indexAbove(index)
+        keys = (index.data(Qt.EditRole) for index in indexes)
+        return [key for key in keys if key is not None]
+
+    def _prefetch(self):
+        if self.enabled:
+            self.metadata.prefetch(self.visible_keys())
+
+
 @ui_loadable
 class RedisTree(QMainWindow):
 
     addKey = Signal(object)
     currentChanged = Signal(object)
 
-    def __init__(self, redis, parent=None):
+    def __init__(self, redis, parent=None, lazy=False):
         super(RedisTree, self).__init__(parent)
         self.load_ui()
         ui = self.ui
         self.redis = redis
-        self.source_model = RedisKeyModel(redis)
+        self.source_model = RedisKeyModel(redis, lazy=lazy)
+        # model of the keys matching the filter, if any
+        self.filter_model = None
+        # BulkOperation running, if any
+        self.bulk = None
+        self.analysis = KeyspaceAnalysis(redis, sep=self.source_model.separator, parent=self)
+        self.analysis.progress.connect(self._on_analysis_progress)
+        self.analysis.finished.connect(self._on_analysis_finished)
+        # live updates of the keys, shared by the filter models
+        self.monitor = KeyspaceMonitor(redis, parent=self)
+        self.monitor.keysChanged.connect(self.source_model.change_keys)
         self.sort_filter_model = QSortFilterProxyModel()
         self.sort_filter_model.setFilterRole(KeyNameRole)
         self.sort_filter_model.setSourceModel(self.source_model)
         ui.tree.setModel(self.sort_filter_model)
+        self.prefetcher = MetadataPrefetcher(ui.tree, redis.metadata, parent=self)
         selection = ui.tree.selectionModel()
         selection.currentChanged.connect(self._on_current_changed)
         selection.selectionChanged.connect(self._on_selection_changed)
-        # TODO: fix bug search of type "bl04:" still gives no result
-        ui.filter_container.setVisible(False)
+        ui.tree.expanded.connect(functools.partial(self._on_expanded, True))
+        ui.tree.collapsed.connect(functools.partial(self._on_expanded, False))
+        ui.filter_timer = QTimer(self)
+        ui.filter_timer.setSingleShot(True)
+        ui.filter_timer.setInterval(300)
+        ui.filter_timer.timeout.connect(self._apply_filter)
         add_menu = QMenu("Add")
         ui.add_string_action = add_menu.addAction("string")
         ui.add_list_action = add_menu.addAction("list")
@@ -241,39 +1210,266 @@ class RedisTree(QMainWindow):
         ui.remove_key_action.triggered.connect(self._on_remove_key)
         ui.touch_key_action.triggered.connect(self._on_touch_key)
         ui.persist_key_action.triggered.connect(self._on_persist_key)
+        ui.expire_key_action.triggered.connect(self._on_expire_key)
         ui.copy_key_action.triggered.connect(self._on_copy_key)
+        ui.export_key_action.triggered.connect(self._on_export_key)
+        ui.live_action.toggled.connect(self._on_live_toggled)
+        if redis.is_cluster():
+            ui.live_action.setEnabled(False)
+            ui.live_action.setToolTip("Live updates are not available on clusters")
+        ui.analyze_action.toggled.connect(self._on_analyze_toggled)
+        ui.metadata_action.toggled.connect(self._on_metadata_toggled)
+        self.monitor.error.connect(self._on_live_error)
+        self.destroyed.connect(self.monitor.stop)
+        self.destroyed.connect(self.analysis.stop)
         ui.filter_edit.textChanged.connect(self._on_filter_changed)
 
+        ui.load_progress = QProgressBar()
+        ui.load_progress.setMaximumWidth(200)
+        ui.load_progress.setFormat("%v keys")
+        ui.cancel_load_button = QToolButton()
+        ui.cancel_load_button.setIcon(QIcon.fromTheme("process-stop"))
+        ui.cancel_load_button.setToolTip("Stop loading keys")
+        ui.cancel_load_button.clicked.connect(self._on_cancel_load)
+        status_bar = self.statusBar()
+        status_bar.addPermanentWidget(ui.load_progress)
+        status_bar.addPermanentWidget(ui.cancel_load_button)
+        self._connect_load(self.source_model)
+
+        ui.bulk_progress = QProgressBar()
+        ui.bulk_progress.setMaximumWidth(200)
+        ui.bulk_progress.setVisible(False)
+        ui.cancel_bulk_button = QToolButton()
+        ui.cancel_bulk_button.setIcon(QIcon.fromTheme("process-stop"))
+        ui.cancel_bulk_button.setToolTip("Stop the operation (keys already processed stay so)")
+        ui.cancel_bulk_button.setVisible(False)
+        ui.cancel_bulk_button.clicked.connect(self._on_cancel_bulk)
+        status_bar.addPermanentWidget(ui.bulk_progress)
+        status_bar.addPermanentWidget(ui.cancel_bulk_button)
+
+        ui.busy_indicator = QProgressBar()
+        ui.busy_indicator.setMaximumWidth(60)
+        ui.busy_indicator.setRange(0, 0)
+        ui.busy_indicator.setToolTip("Waiting for redis...")
+        ui.busy_indicator.setVisible(redis.executor.is_busy())
+        status_bar.insertPermanentWidget(0, ui.busy_indicator)
+        redis.executor.busyChanged.connect(ui.busy_indicator.setVisible)
+        redis.metadata.updated.connect(self._on_metadata_updated)
+
     def contextMenuEvent(self, event):
         pass
 
-    def _get_selected_keys(self):
+    @property
+    def key_model(self):
+        """The RedisKeyModel being displayed"""
+        return self.sort_filter_model.sourceModel()
+
+    def _connect_load(self, model):
+        model.loadStarted.connect(self._on_load_started)
+        model.loadProgress.connect(self._on_load_progress)
+        model.loadFinished.connect(self._on_load_finished)
+        if model.is_loading():
+            self._on_load_started()
+
+    def _get_selected_nodes(self):
         selection = self.ui.tree.selectionModel()
         indexes = (self.sort_filter_model.mapToSource(i) for i in selection.selectedIndexes())
-        nodes = (self.source_model.data(i, NodeRole) for i in indexes)
-        keys = tuple(node.key for node in nodes if node is not None and node.is_key())
+        nodes = (self.key_model.data(i, NodeRole) for i in indexes)
+        return [node for node in nodes if node is not None]
+
+    def _get_selected_keys(self):
+        nodes = self._get_selected_nodes()
+        keys = tuple(node.key for node in nodes if node.is_key())
         return keys
 
+    def _get_selection(self):
+        """
+        Keys and SCAN MATCH patterns of the whole subtrees of the selected
+        folders (nodes inside a selected folder are left out)
+        """
+        nodes = set(self._get_selected_nodes())
+        keys, patterns = [], []
+        for node in nodes:
+            parent = node.parent
+            while parent is not None and parent not in nodes:
+                parent = parent.parent
+            if parent is not None:
+                continue
+            if node.is_key():
+                keys.append(node.key)
+            if not node.is_key() or self.key_model.may_have_children(node):
+                prefix = node.full_name + self.key_model.separator
+                patterns.append(glob_escape(prefix) + "*")
+        return keys, patterns
+
+    def _on_load_started(self):
+        ui = self.ui
+        ui.load_progress.setRange(0, 0)
+        ui.load_progress.setVisible(True)
+        ui.cancel_load_button.setVisible(True)
+        ui.update_db_action.setEnabled(False)
+
+    def _on_load_progress(self, loaded, total):
+        # SCAN may report keys more than once so total is only an estimate
+        self.ui.load_progress.setRange(0, max(loaded, total))
+        self.ui.load_progress.setValue(loaded)
+
+    def _on_load_finished(self):
+        model = self.key_model
+        if self.sender() not in (None, model) and model.is_loading():
+            return
+        ui = self.ui
+        ui.load_progress.setVisible(False)
+        ui.cancel_load_button.setVisible(False)
+        ui.update_db_action.setEnabled(True)
+        self.statusBar().showMessage("{} keys loaded".format(model.loaded), 5000)
+
+    def _on_cancel_load(self):
+        self.source_model.cancel_load()
+        if self.filter_model is not None:
+            self.filter_model.cancel_load()
+
+    def _on_metadata_updated(self, keys):
+        # tooltips are shown before the key metadata arrives: refresh them
+        if not QToolTip.isVisible():
+            return
+        tree = self.ui.tree
+        viewport = tree.viewport()
+        index = tree.indexAt(viewport.mapFromGlobal(QCursor.pos()))
+        if index.isValid() and index.data(Qt.EditRole) in set(keys):
+            QToolTip.showText(
+                QCursor.pos(), index.data(Qt.ToolTipRole), viewport, tree.visualRect(index)
+            )
+
+    def _on_live_toggled(self, live):
+        if live:
+            self.monitor.start()
+        else:
+            self.monitor.stop()
+
+    def _on_live_error(self, error):
+        ui = self.ui
+        ui.live_action.setChecked(False)
+        if not isinstance(error, NotificationsDisabled):
+            QMessageBox.warning(self, "Live updates stopped", repr(error))
+            return
+        result = QMessageBox.question(
+            self,
+            "Keyspace notifications disabled",
+            "Live updates need the server to publish keyspace notifications.\n"
+            "Enable them (CONFIG SET notify-keyspace-events)?",
+        )
+        if result == QMessageBox.Yes:
+            self.redis.submit(
+                self.monitor.enable_notifications,
+                callback=lambda _: ui.live_action.setChecked(True),
+            )
+
+    def _on_analyze_toggled(self, analyze):
+        ui, analysis = self.ui, self.analysis
+        if analyze:
+            rate, ok = QInputDialog.getDouble(
+                self,
+                "Keyspace analysis",
+                "Percentage of the keys to sample:",
+                100 * analysis.rate, 0.01, 100, 2,
+            )
+            if not ok:
+                ui.analyze_action.setChecked(False)
+                return
+            analysis.rate = rate / 100
+            analysis.start()
+        else:
+            analysis.stop()
+        model = analysis if analyze else None
+        self.source_model.set_analysis(model)
+        if self.filter_model is not None:
+            self.filter_model.set_analysis(model)
+        self._update_header()
+
+    def _on_metadata_toggled(self, shown):
+        self.source_model.set_metadata(shown)
+        if self.filter_model is not None:
+            self.filter_model.set_metadata(shown)
+        self.prefetcher.set_enabled(shown)
+        self._update_header()
+
+    def _update_header(self):
+        tree = self.ui.tree
+        columns = self.source_model.columnCount()
+        tree.setHeaderHidden(columns == 1)
+        if columns > 1:
+            header = tree.header()
+            header.setStretchLastSection(False)
+            header.setSectionResizeMode(0, QHeaderView.Stretch)
+            for column in range(1, header.count()):
+                header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
+
+    def _on_analysis_progress(self, scanned, sampled):
+        self.statusBar().showMessage(
+            "Analyzing: {} keys scanned, {} sampled".format(scanned, sampled)
+        )
+
+    def _on_analysis_finished(self):
+        analysis = self.analysis
+        message = "Analysis done: {} keys sampled".format(analysis.sampled)
+        if not analysis.has_memory:
+            message += " (MEMORY USAGE not supported by the server)"
+        self.statusBar().showMessage(message)
+
     def _on_filter_changed(self, text):
-        if not text.endswith("*"):
-            text += "*"
-        self.sort_filter_model.setFilterWildcard(text)
+        # wait for the user to stop typing
+        self.ui.filter_timer.start()
+
+    def _apply_filter(self):
+        text = self.ui.filter_edit.text()
+        source, previous = self.source_model, self.filter_model
+        if text:
+            pattern = text if text.endswith("*") else text + "*"
+            # search the local tree if it holds all the keys, the server
+            # otherwise. Either way matches are streamed into the view
+            keys = source.match_keys(pattern) if source.complete else None
+            model = RedisKeyModel(
+                self.redis, filter=pattern, sep=source.separator, keys=keys
+            )
+            self.monitor.keysChanged.connect(model.change_keys)
+            model.set_analysis(source.analysis)
+            model.set_metadata(source.metadata_shown)
+            self.filter_model = model
+        else:
+            model, self.filter_model = source, None
+        self.sort_filter_model.setSourceModel(model)
+        if previous is not None:
+            previous.cancel_load()
+            previous.deleteLater()
+        if model is source:
+            self._on_load_finished()
+        else:
+            self._connect_load(model)
+            self.ui.tree.expand(self.sort_filter_model.index(0, 0))
+
+    def _on_expanded(self, expanded, index):
+        index = self.sort_filter_model.mapToSource(index)
+        self.key_model.set_expanded(index, expanded)
 
     def _on_current_changed(self, current, previous):
         current = self.sort_filter_model.mapToSource(current)
-        node = self.source_model.data(current, Qt.UserRole)
+        node = self.key_model.data(current, Qt.UserRole)
         self.currentChanged.emit(node)
 
     def _on_selection_changed(self, selected, deselected):
-        indexes = (self.sort_filter_model.mapToSource(i) for i in selected.indexes())
-        nodes = (self.source_model.data(i, NodeRole) for i in indexes)
-        nodes = [node for node in nodes if node is not None]
-        nodes_selected = bool(nodes)
+        self._update_actions()
+
+    def _update_actions(self):
+        nodes = self._get_selected_nodes()
+        nodes_selected = bool(nodes) and self.bulk is None
         ui = self.ui
         ui.remove_key_action.setEnabled(nodes_selected)
         ui.touch_key_action.setEnabled(nodes_selected)
         ui.persist_key_action.setEnabled(nodes_selected)
-        ui.copy_key_action.setEnabled(len(nodes) == 1)
+        ui.expire_key_action.setEnabled(nodes_selected)
+        ui.export_key_action.setEnabled(nodes_selected)
+        ui.copy_key_action.setEnabled(len(nodes) == 1 and nodes[0].is_key())
 
     def _on_flush_db(self):
         result = QMessageBox.question(
@@ -281,21 +1477,101 @@ class RedisTree(QMainWindow):
             "This action will delete all data from the current database.\n" \
             "Are you absolutely sure?")
         if result == QMessageBox.Yes:
-            self.redis.flushdb()
-            self.source_model.refresh()
+            self.redis.submit(self.redis.flushdb, callback=self._on_reset_db)
 
-    def _on_update_db(self):
+    def _on_update_db(self, *args):
         self.source_model.refresh()
+        if self.filter_model is not None:
+            self.filter_model.refresh()
+
+    def _on_reset_db(self, *args):
+        self.source_model.refresh(reset=True)
+        if self.filter_model is not None:
+            self.filter_model.refresh(reset=True)
+
+    def _run_bulk(self, command, keys, patterns, args=()):
+        if self.bulk is not None or not (keys or patterns):
+            return
+        self._start_bulk(BulkOperation(
+            self.redis, command, keys, patterns, args, filter=self.key_model.filter,
+            parent=self
+        ))
+
+    def _start_bulk(self, bulk):
+        ui = self.ui
+        self.bulk = bulk
+        bulk.progress.connect(self._on_bulk_progress)
+        bulk.finished.connect(self._on_bulk_finished)
+        bulk.error.connect(self._on_bulk_error)
+        # the number of keys under the folders is unknown
+        ui.bulk_progress.setRange(0, 0 if bulk.patterns else bulk.total)
+        ui.bulk_progress.setValue(0)
+        ui.bulk_progress.setFormat("{} %v keys".format(bulk.command))
+        ui.bulk_progress.setVisible(True)
+        ui.cancel_bulk_button.setVisible(True)
+        self._update_actions()
+        bulk.start()
+
+    def _on_bulk_progress(self, done):
+        self.ui.bulk_progress.setValue(done)
+        if isinstance(self.bulk, ExportOperation):
+            self.statusBar().showMessage(self.bulk.status())
+
+    def _on_bulk_finished(self):
+        ui, bulk = self.ui, self.bulk
+        ui.bulk_progress.setVisible(False)
+        ui.cancel_bulk_button.setVisible(False)
+        self.statusBar().showMessage(bulk.status(), 5000)
+        self.bulk = None
+        bulk.deleteLater()
+        self._update_actions()
+        if bulk.command == "delete" and bulk.patterns and self.source_model.lazy:
+            # keys of folders never expanded are not in the tree: rescan the
+            # loaded folders to drop the ones left empty
+            self._on_update_db()
+
+    def _on_bulk_error(self, error):
+        QMessageBox.warning(self, "Error", repr(error))
+
+    def _on_cancel_bulk(self):
+        if self.bulk is not None:
+            self.bulk.cancel()
+
+    def _on_export_key(self):
+        keys, patterns = self._get_selection()
+        if self.bulk is not None or not (keys or patterns):
+            return
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export keys", "", "Dump (*.qrdump);;Compressed dump (*.qrdump.gz)"
+        )
+        if not path:
+            return
+        compress = selected.startswith("Compressed") or path.endswith(".gz")
+        try:
+            bulk = ExportOperation(
+                self.redis, path, keys, patterns, compress=compress,
+                filter=self.key_model.filter, parent=self
+            )
+        except OSError as error:
+            QMessageBox.warning(self, "Export failed", str(error))
+            return
+        self._start_bulk(bulk)
 
     def _on_touch_key(self):
-        keys = self._get_selected_keys()
-        if keys:
-            self.redis.touch(*keys)
+        self._run_bulk("touch", *self._get_selection())
 
     def _on_persist_key(self):
-        keys = self._get_selected_keys()
-        for key in keys:
-            self.redis.persist(key)
+        self._run_bulk("persist", *self._get_selection())
+
+    def _on_expire_key(self):
+        keys, patterns = self._get_selection()
+        if not (keys or patterns):
+            return
+        ttl, ok = QInputDialog.getInt(
+            self, "Expire", "Time to live (seconds):", 3600, 1, 2**31 - 1
+        )
+        if ok:
+            self._run_bulk("expire", keys, patterns, (ttl,))
 
     def _on_add_key(self, dtype):
         value = None
@@ -311,9 +1587,18 @@ class RedisTree(QMainWindow):
         self.addKey.emit(item)
 
     def _on_remove_key(self):
-        keys = self._get_selected_keys()
-        if keys:
-            self.redis.delete(*keys)
+        keys, patterns = self._get_selection()
+        if patterns:
+            folders = "\n".join(pattern[:-1] for pattern in patterns[:10])
+            result = QMessageBox.question(
+                self, "Delete folders",
+                "Delete all the keys under:\n{}{}".format(
+                    folders, "\n..." if len(patterns) > 10 else ""
+                ),
+            )
+            if result != QMessageBox.Yes:
+                return
+        self._run_bulk("delete", keys, patterns)
         self.ui.tree.clearSelection()
 
     def _on_copy_key(self):
@@ -322,10 +1607,12 @@ class RedisTree(QMainWindow):
         src = keys[0]
         dst, ok = QInputDialog.getText(self, f"Copy {src!r} to...", "New key")
         if ok:
-            # redis.copy() only >= 6.2
-            #self.redis.copy(src, dst)
-            self.redis[dst] = self.redis[src].value
-            self.source_model.refresh()
+            self.redis.submit(self._copy_key, src, dst)
+
+    def _copy_key(self, src, dst):
+        # redis.copy() only >= 6.2
+        #self.redis.copy(src, dst)
+        self.redis[dst] = self.redis[src].value
 
 
 def main():
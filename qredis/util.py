@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 import textwrap
 import collections
@@ -24,7 +25,42 @@ KeyItem = collections.namedtuple("KeyItem", "redis key type ttl value")
 KeyItem.toolTip = toolTip
 
 
+def summary_toolTip(summary):
+    if summary.type == "string":
+        length = "{} bytes".format(summary.length)
+    else:
+        length = "{} items".format(summary.length)
+    memory = "?" if summary.memory is None else human_size(summary.memory)
+    head = textwrap.shorten(str(summary.head), 80)
+    return f"""\
+name: {summary.key}
+type: {summary.type}
+TTL: {summary.ttl}
+Length: {length}
+Memory: {memory}
+Head: {head}"""
+
+
+# what is worth knowing about a key without reading its value
+KeySummary = collections.namedtuple("KeySummary", "key type ttl length memory head")
+KeySummary.toolTip = summary_toolTip
+
+
+CLUSTER_TEXT = """\
+Cluster
+Primaries:
+{nodes}"""
+
+
+def cluster_str(redis):
+    nodes = sorted(node.name for node in redis.get_primaries())
+    text = "Cluster @ {} ({} primaries)".format(nodes[0], len(nodes))
+    return text, CLUSTER_TEXT.format(nodes="\n".join(nodes))
+
+
 def redis_str(redis):
+    if hasattr(redis, "get_primaries"):
+        return cluster_str(redis)
     info = redis.connection_pool.connection_kwargs
     db = info["db"]
     cid = redis.client_id()
@@ -55,6 +91,332 @@ def redis_value(redis, key, dtype=None):
     return value
 
 
+class PagedValue:
+    """First window of a collection value too big to be fetched at once"""
+
+    __slots__ = ["head", "length", "bookmark"]
+
+    def __init__(self, head, length, bookmark):
+        self.head = head
+        self.length = length
+        self.bookmark = bookmark
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return "{}... ({} items)".format(str(self.head)[:60], self.length)
+
+
+def _last(count):
+    return -1 if count is None else count - 1
+
+
+_VALUE_FETCHERS = {
+    "string": lambda pipe, key, count: pipe.get(key),
+    "hash": lambda pipe, key, count: (
+        pipe.hgetall(key) if count is None else pipe.hscan(key, 0, count=count)
+    ),
+    "list": lambda pipe, key, count: pipe.lrange(key, 0, _last(count)),
+    "set": lambda pipe, key, count: (
+        pipe.smembers(key) if count is None else pipe.sscan(key, 0, count=count)
+    ),
+    "zset": lambda pipe, key, count: pipe.zrange(
+        key, 0, _last(count), withscores=True
+    ),
+    "stream": lambda pipe, key, count: pipe.xrange(key, count=count),
+}
+
+_LENGTH_FETCHERS = {
+    "hash": lambda pipe, key: pipe.hlen(key),
+    "list": lambda pipe, key: pipe.llen(key),
+    "set": lambda pipe, key: pipe.scard(key),
+    "zset": lambda pipe, key: pipe.zcard(key),
+    "stream": lambda pipe, key: pipe.xlen(key),
+}
+
+
+def next_stream_id(entry_id):
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    ms, seq = entry_id.split("-")
+    return "{}-{}".format(ms, int(seq) + 1)
+
+
+def _first_page(dtype, value, length, count):
+    """Split the head of a collection in (head, bookmark of the next page)"""
+    if dtype in {"hash", "set"}:
+        cursor, value = value
+        return value, (cursor or None)
+    elif dtype in {"list", "zset"}:
+        return value, (len(value) if length > len(value) else None)
+    elif dtype == "stream":
+        more = value and length > len(value)
+        return value, (next_stream_id(value[-1][0]) if more else None)
+    return value, None
+
+
+def _pipeline_result(result):
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def redis_fetch(redis, key, count=None):
+    """
+    Fetch type, TTL and raw value of a key in a single round trip.
+
+    The value commands of every type are pipelined after TYPE and TTL: the
+    ones not matching the key type fail fast on the server with WRONGTYPE
+    and are discarded.
+
+    If *count* is given, collections are only fetched up to (roughly) count
+    elements. Their length is pipelined as well and, if the value didn't fit,
+    the bookmark to continue with :func:`redis_page` is returned.
+
+    Returns None if the key doesn't exist or a tuple
+    (type, ttl, value, length, bookmark).
+    """
+    pipe = redis.pipeline(transaction=False)
+    queue_fetch(pipe, key, count)
+    fetched = fetch_result(pipe.execute(raise_on_error=False), count)
+    if fetched is not None and fetched[2] is RETRY:
+        # SCAN didn't reach the end of a small value; just get it all
+        value = fetch_all(redis, key, fetched[0])
+        fetched = fetched[:2] + (value, fetched[3], None)
+    return fetched
+
+
+# value placeholder of fetch_result() meaning the value must be fetched again
+RETRY = object()
+
+
+def queue_fetch(pipe, key, count=None):
+    """
+    Queue the commands of :func:`redis_fetch` on a pipeline (which may be a
+    redis.asyncio one). Returns the number of commands queued.
+    """
+    pipe.type(key)
+    pipe.ttl(key)
+    for fetch in _VALUE_FETCHERS.values():
+        fetch(pipe, key, count)
+    if count is None:
+        return 2 + len(_VALUE_FETCHERS)
+    for fetch in _LENGTH_FETCHERS.values():
+        fetch(pipe, key)
+    return 2 + len(_VALUE_FETCHERS) + len(_LENGTH_FETCHERS)
+
+
+def fetch_result(results, count=None):
+    """
+    The result of :func:`redis_fetch` from the results of the pipeline
+    filled by :func:`queue_fetch`. The value is RETRY if it must be fetched
+    again in full.
+    """
+    dtype, ttl, *results = results
+    dtype = _pipeline_result(dtype)
+    dtype = dtype.decode() if isinstance(dtype, bytes) else dtype
+    if dtype == "none":
+        return None
+    ttl = -1 if ttl is None else ttl  # handle redis < 2.8
+    value, length, bookmark = None, None, None
+    if dtype in _VALUE_FETCHERS:
+        value = _pipeline_result(results[list(_VALUE_FETCHERS).index(dtype)])
+    if count is not None and dtype in _LENGTH_FETCHERS:
+        lengths = results[len(_VALUE_FETCHERS):]
+        length = _pipeline_result(lengths[list(_LENGTH_FETCHERS).index(dtype)])
+        value, bookmark = _first_page(dtype, value, length, count)
+        if bookmark is not None and length <= count:
+            value, bookmark = RETRY, None
+    return dtype, ttl, value, length, bookmark
+
+
+def fetch_all(redis, key, dtype):
+    """Command reading the whole value of a key of the given type"""
+    return _VALUE_FETCHERS[dtype](redis, key, None)
+
+
+def _start(bookmark, count):
+    start = bookmark or 0
+    return start, start + count - 1
+
+
+_PAGE_FETCHERS = {
+    "list": lambda redis, key, bookmark, count: redis.lrange(
+        key, *_start(bookmark, count)
+    ),
+    "zset": lambda redis, key, bookmark, count: redis.zrange(
+        key, *_start(bookmark, count), withscores=True
+    ),
+    "hash": lambda redis, key, bookmark, count: redis.hscan(
+        key, bookmark or 0, count=count
+    ),
+    "set": lambda redis, key, bookmark, count: redis.sscan(
+        key, bookmark or 0, count=count
+    ),
+    "stream": lambda redis, key, bookmark, count: redis.xrange(
+        key, min=bookmark or "-", count=count
+    ),
+}
+
+
+def _page_command(redis, key, dtype, bookmark, count):
+    """Send (or, on redis.asyncio, prepare) the command reading a window"""
+    if dtype not in _PAGE_FETCHERS:
+        raise ValueError("{} values are not paged".format(dtype))
+    return _PAGE_FETCHERS[dtype](redis, key, bookmark, count)
+
+
+def _page_result(dtype, bookmark, count, result):
+    """Split the reply of _page_command in (items, next bookmark)"""
+    if dtype in {"hash", "set"}:
+        cursor, items = result
+        return items, (cursor or None)
+    elif dtype == "stream":
+        more = len(result) == count
+        return result, (next_stream_id(result[-1][0]) if more else None)
+    return result, ((bookmark or 0) + count if len(result) == count else None)
+
+
+def redis_page(redis, key, dtype, bookmark=None, count=1000):
+    """
+    Fetch one window of a collection value.
+
+    *bookmark* is where the window starts: an index for lists and zsets, a
+    SCAN cursor for hashes and sets and an entry ID for streams (None means
+    the beginning). Returns the raw elements and the bookmark of the next
+    window (None once the end is reached).
+    """
+    while True:
+        result = _page_command(redis, key, dtype, bookmark, count)
+        items, bookmark = _page_result(dtype, bookmark, count, result)
+        # SCAN may return empty windows before reaching the end
+        if items or bookmark is None:
+            return items, bookmark
+
+
+async def redis_page_async(redis, key, dtype, bookmark=None, count=1000):
+    """:func:`redis_page` for redis.asyncio clients"""
+    while True:
+        result = await _page_command(redis, key, dtype, bookmark, count)
+        items, bookmark = _page_result(dtype, bookmark, count, result)
+        if items or bookmark is None:
+            return items, bookmark
+
+
+_SIZE_FETCHERS = dict(
+    string=lambda pipe, key: pipe.strlen(key), **_LENGTH_FETCHERS
+)
+
+_HEAD_FETCHERS = dict(
+    _VALUE_FETCHERS,
+    # count is in elements, make it a few characters per element for strings
+    string=lambda pipe, key, count: pipe.getrange(key, 0, 16 * count - 1),
+)
+
+
+def queue_summary(pipe, key, head=5, samples=None):
+    """
+    Queue the commands of :func:`redis_summary` for one key on a pipeline.
+    Returns the number of commands queued.
+    """
+    pipe.type(key)
+    pipe.ttl(key)
+    pipe.memory_usage(key, samples=samples)
+    for fetch in _SIZE_FETCHERS.values():
+        fetch(pipe, key)
+    for fetch in _HEAD_FETCHERS.values():
+        fetch(pipe, key, head)
+    return 3 + len(_SIZE_FETCHERS) + len(_HEAD_FETCHERS)
+
+
+def summary_result(results):
+    """
+    (type, ttl, length, memory, raw head) of a key from the results of the
+    commands queued by :func:`queue_summary` or None if it doesn't exist
+    """
+    dtype, ttl, memory, *results = results
+    dtype = _pipeline_result(dtype)
+    dtype = dtype.decode() if isinstance(dtype, bytes) else dtype
+    if dtype == "none" or dtype not in _SIZE_FETCHERS:
+        return None
+    ttl = -1 if ttl is None else _pipeline_result(ttl)
+    if isinstance(memory, Exception):
+        memory = None
+    length = _pipeline_result(results[list(_SIZE_FETCHERS).index(dtype)])
+    heads = results[len(_SIZE_FETCHERS):]
+    head = _pipeline_result(heads[list(_HEAD_FETCHERS).index(dtype)])
+    if dtype in {"hash", "set"}:
+        # SCAN reply: (cursor, elements)
+        head = head[1]
+    return dtype, ttl, length, memory, head
+
+
+def redis_summary(redis, keys, head=5, samples=None):
+    """
+    Type, TTL, length (STRLEN, LLEN, HLEN...), memory usage and first
+    *head* elements of the given keys in a single round trip, without
+    reading their whole values.
+
+    Like in :func:`redis_fetch` the commands of every type are pipelined
+    and the ones not matching the key type fail fast with WRONGTYPE. memory
+    is None if MEMORY USAGE is not available (see :func:`redis_sample`).
+
+    Returns a dict of key: (type, ttl, length, memory, raw head), without
+    the keys which don't exist.
+    """
+    pipe = redis.pipeline(transaction=False)
+    sizes = [queue_summary(pipe, key, head, samples) for key in keys]
+    results = pipe.execute(raise_on_error=False)
+    summaries, start = {}, 0
+    for key, size in zip(keys, sizes):
+        summary = summary_result(results[start:start + size])
+        start += size
+        if summary is not None:
+            summaries[key] = summary
+    return summaries
+
+
+def redis_sample(redis, keys, samples=None):
+    """
+    Type, memory usage and TTL of the given keys in a single round trip.
+
+    Returns a list of (key, type, memory, ttl) where memory is the size in
+    bytes reported by MEMORY USAGE (None if the server doesn't support it,
+    ex: redis < 4 or managed services which disable it) and ttl is in
+    seconds (-1 for keys without expiration). *samples* is the number of
+    nested elements MEMORY USAGE looks at (server default if None). Keys
+    which disappeared in the meantime are left out.
+    """
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+        pipe.memory_usage(key, samples=samples)
+        pipe.pttl(key)
+    results = iter(pipe.execute(raise_on_error=False))
+    sampled = []
+    for key, dtype, memory, pttl in zip(keys, results, results, results):
+        dtype = _pipeline_result(dtype)
+        dtype = dtype.decode() if isinstance(dtype, bytes) else dtype
+        if dtype == "none":
+            continue
+        if isinstance(memory, Exception):
+            memory = None
+        pttl = _pipeline_result(pttl)
+        sampled.append((key, dtype, memory, pttl / 1000 if pttl >= 0 else -1))
+    return sampled
+
+
+def human_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return "{:.0f} {}".format(size, unit) if unit == "B" else "{:.1f} {}".format(size, unit)
+
+
 def redis_key_split(key, chars="."):
     result, curr = [], ""
     for char in key:
@@ -67,6 +429,76 @@ def redis_key_split(key, chars="."):
     return result
 
 
+def _glob_class(pattern, i):
+    """Regex of the [...] set starting after pattern[i - 1] and its end"""
+    negate = pattern.startswith("^", i)
+    i += negate
+    items = []
+    while i < len(pattern) and pattern[i] != "]":
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            i += 1
+            char = pattern[i]
+        elif pattern.startswith("-", i + 1) and i + 2 < len(pattern):
+            low, high = sorted((char, pattern[i + 2]))
+            items.append(re.escape(low) + "-" + re.escape(high))
+            i += 3
+            continue
+        items.append(re.escape(char))
+        i += 1
+    if not items:
+        return ("." if negate else "(?!)"), i + 1
+    return "[{}{}]".format("^" if negate else "", "".join(items)), i + 1
+
+
+def glob_matcher(pattern):
+    """
+    A function telling whether a key matches a redis glob-style pattern
+    (*, ?, [abc], [^a-z] and \\ escapes). Unlike fnmatch.filter, matching is
+    always case sensitive, like SCAN MATCH and KEYS on the server.
+    """
+    regex, i = [], 0
+    while i < len(pattern):
+        char = pattern[i]
+        i += 1
+        if char == "*":
+            regex.append(".*")
+        elif char == "?":
+            regex.append(".")
+        elif char == "\\" and i < len(pattern):
+            regex.append(re.escape(pattern[i]))
+            i += 1
+        elif char == "[":
+            part, i = _glob_class(pattern, i)
+            regex.append(part)
+        else:
+            regex.append(re.escape(char))
+    return re.compile("".join(regex) + r"\Z", re.DOTALL).match
+
+
+# notify-keyspace-events classes covering every key write and removal
+# (generic, string, list, set, hash, zset, expired, evicted). "A" is their alias
+KEYSPACE_EVENT_CLASSES = "g$lshzxe"
+
+
+def notifications_enabled(flags):
+    """
+    Whether the notify-keyspace-events *flags* make the server publish
+    every key change as keyspace (K) or keyevent (E) notifications
+    """
+    return ("E" in flags or "K" in flags) and (
+        "A" in flags or all(c in flags for c in KEYSPACE_EVENT_CLASSES)
+    )
+
+
+def missing_notification_flags(flags):
+    """The flags to add to *flags* for notifications_enabled to hold"""
+    missing = "" if "E" in flags or "K" in flags else "E"
+    if "A" not in flags:
+        missing += "".join(c for c in KEYSPACE_EVENT_CLASSES if c not in flags)
+    return missing
+
+
 __startup_cwd = os.getcwd()
 
 
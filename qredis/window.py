@@ -91,7 +91,7 @@ class RedisWindow(QMainWindow):
 
     def add_redis_panel(self, redis, opts):
         name, _ = redis_str(redis)
-        panel = RedisPanel(redis)
+        panel = RedisPanel(redis, lazy=opts.get("lazy", False))
         window = self.ui.mdi.addSubWindow(panel)
         window.setAttribute(Qt.WA_DeleteOnClose)
         window.setWindowTitle(name)
@@ -113,7 +113,21 @@ def main():
     parser.add_argument("--name", default="qredis", help="Client name")
     parser.add_argument("-f", "--key-filter", default="*", help="Key filter")
     parser.add_argument("--key-split", default=".:", help="Key splitter")
+    parser.add_argument(
+        "--lazy-tree",
+        action="store_true",
+        help="Scan key folders only when expanded (for huge databases)",
+    )
     parser.add_argument("--redis-url", help="Redis connection URL (overrides host/port/sock/db)")
+    parser.add_argument(
+        "--cluster", action="store_true", help="Connect to a Redis Cluster through the given node"
+    )
+    parser.add_argument(
+        "--client-cache",
+        type=int,
+        metavar="MB",
+        help="Cache values client side, kept coherent with CLIENT TRACKING (redis >= 6)",
+    )
     parser.add_argument(
         "--log-level",
         default="WARNING",
@@ -127,7 +141,7 @@ def main():
     logging.basicConfig(format=fmt, level=level)
 
     # Build connection options
-    opts = dict(filter=args.key_filter, split_by=args.key_split)
+    opts = dict(filter=args.key_filter, split_by=args.key_split, lazy=args.lazy_tree)
 
     # Prefer explicit flag, then environment variable, then CLI tuple
     redis_url = args.redis_url or os.environ.get("REDIS_URL")
@@ -138,6 +152,10 @@ def main():
     if redis_url:
         kwargs = _parse_redis_url(redis_url)
         kwargs["client_name"] = args.name
+        if args.client_cache:
+            kwargs["client_cache"] = args.client_cache * 1024 * 1024
+        if args.cluster:
+            kwargs["cluster"] = True
         try:
             r = QRedis(**kwargs)
             window.add_redis_panel(r, opts)
@@ -153,6 +171,10 @@ def main():
             kwargs["unix_socket_path"] = args.sock
         if args.db is not None:
             kwargs["db"] = args.db
+        if len(kwargs) > 1 and args.client_cache:
+            kwargs["client_cache"] = args.client_cache * 1024 * 1024
+        if len(kwargs) > 1 and args.cluster:
+            kwargs["cluster"] = True
         if len(kwargs) > 1:
             try:
                 r = QRedis(**kwargs)
@@ -0,0 +1,117 @@
+import logging
+
+from qtpy.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class Request:
+    """A call scheduled on a RedisExecutor"""
+
+    __slots__ = ["func", "args", "kwargs", "callback", "errback", "group", "cancelled"]
+
+    def __init__(self, func, args, kwargs, callback=None, errback=None, group=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.errback = errback
+        self.group = group
+        self.cancelled = False
+
+    def __repr__(self):
+        name = getattr(self.func, "__name__", self.func)
+        return f"Request(func={name}, group={self.group}, cancelled={self.cancelled})"
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _Task(QRunnable):
+    def __init__(self, executor, request):
+        super(_Task, self).__init__()
+        self.executor = executor
+        self.request = request
+
+    def run(self):
+        request, result, error = self.request, None, None
+        if not request.cancelled:
+            try:
+                result = request.func(*request.args, **request.kwargs)
+            except Exception as err:
+                error = err
+        try:
+            self.executor._done.emit(request, result, error)
+        except RuntimeError:
+            # executor was destroyed while the request was running
+            pass
+
+
+class RedisExecutor(QObject):
+    """
+    Runs redis calls on a dedicated worker thread and delivers the results
+    back to the GUI thread through the request callbacks.
+
+    redis-py hands each thread its own connection from the pool so the
+    worker never shares a socket with the GUI thread.
+
+    Submitting a request with a *group* cancels the previous request of the
+    same group: if it didn't start yet it is skipped, otherwise its result
+    is discarded.
+    """
+
+    busyChanged = Signal(bool)
+    _done = Signal(object, object, object)
+
+    def __init__(self, parent=None):
+        super(RedisExecutor, self).__init__(parent)
+        self._groups = {}
+        self._pending = 0
+        # a single worker thread keeps requests in submission order
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._done.connect(self._on_done)
+
+    def submit(self, func, *args, callback=None, errback=None, group=None, **kwargs):
+        request = Request(func, args, kwargs, callback, errback, group)
+        if group is not None:
+            previous = self._groups.get(group)
+            if previous is not None:
+                previous.cancel()
+            self._groups[group] = request
+        self._pending += 1
+        if self._pending == 1:
+            self.busyChanged.emit(True)
+        self._pool.start(_Task(self, request))
+        return request
+
+    def cancel(self, group):
+        request = self._groups.pop(group, None)
+        if request is not None:
+            request.cancel()
+
+    def is_busy(self):
+        return self._pending > 0
+
+    def shutdown(self):
+        for request in self._groups.values():
+            request.cancel()
+        self._pool.waitForDone()
+
+    def _on_done(self, request, result, error):
+        self._pending -= 1
+        if self._groups.get(request.group) is request:
+            del self._groups[request.group]
+        try:
+            if request.cancelled:
+                pass
+            elif error is not None:
+                if request.errback is None:
+                    logging.error("error running %r", request, exc_info=error)
+                else:
+                    request.errback(error)
+            elif request.callback is not None:
+                request.callback(result)
+        except Exception:
+            logging.exception("error on %r callback", request)
+        finally:
+            if not self._pending:
+                self.busyChanged.emit(False)
@@ -1,17 +1,22 @@
 import argparse
+import json
 import logging
 import os
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Optional
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from hypercorn.config import Config as HypercornConfig
 from hypercorn.asyncio import serve as hypercorn_serve
 import asyncio
 
-from .redis import WebRedis
+from qredis.cluster import ClusterCursor
+from qredis.util import PagedValue
+
+from .cache import CachedResponse, ResponseCache
+from .redis import AsyncWebRedis
 
 
 app = FastAPI(title="QRedis Web", version="0.1.0")
@@ -26,17 +31,57 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 
 # Global Redis instance (per-process) – configured by main() or startup
-_redis: Optional[WebRedis] = None
+_redis: Optional[AsyncWebRedis] = None
 
 
-def get_r() -> WebRedis:
+def get_r() -> AsyncWebRedis:
     if _redis is None:
         raise RuntimeError("Redis client not initialized. Start via CLI.")
     return _redis
 
 
+# Cache of /api/info and /api/key responses (configured by main())
+_cache = ResponseCache()
+# drop cached keys on keyspace notifications
+_cache_notifications = False
+_watch_task: Optional["asyncio.Task[None]"] = None
+
+
+def _etag_response(request: Request, entry: CachedResponse) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    etags = {tag.strip().lstrip("W/") for tag in if_none_match.split(",")}
+    if entry.etag in etags or "*" in etags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def _cached_json(
+    request: Request,
+    cache_key: Hashable,
+    build: Callable[[], Awaitable[Any]],
+    redis_key: Optional[str] = None,
+) -> Response:
+    """The JSON response of build() from the cache if fresh, built and
+    stored otherwise. Answers 304 if the client already has it (ETag)."""
+    entry = _cache.get(cache_key)
+    if entry is None:
+        body = JSONResponse(await build()).body
+        entry = _cache.put(cache_key, body, redis_key)
+    return _etag_response(request, entry)
+
+
+async def _watch_keys(r: AsyncWebRedis) -> None:
+    try:
+        await r.watch_keys(_cache.invalidate)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logging.exception("cache invalidation stopped, cached keys now only expire after %ss", _cache.ttl)
+
+
 @app.get("/api/health")
-def health() -> Dict[str, str]:
+async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
@@ -44,47 +89,178 @@ def health() -> Dict[str, str]:
 def _init_from_env() -> None:
     """Optional lazy init for deployments that run an ASGI server (e.g., Hypercorn).
 
-    Reads REDIS_URL (if present) and configures a WebRedis.
+    Reads REDIS_URL (if present) and configures an AsyncWebRedis.
     """
     global _redis
     if _redis is None:
         url = os.environ.get("REDIS_URL")
         if url:
             kwargs = _parse_redis_url(url)
-            _redis = WebRedis(**kwargs)
+            _redis = AsyncWebRedis(**kwargs)
+
+
+@app.on_event("startup")
+async def _start_cache_invalidation() -> None:
+    global _watch_task
+    if _cache_notifications and _cache.enabled and _redis is not None:
+        if _redis.is_cluster():
+            logging.warning("keyspace notifications are not followed on clusters, cached keys only expire")
+            return
+        _watch_task = asyncio.create_task(_watch_keys(_redis))
+
+
+@app.on_event("shutdown")
+async def _close_redis() -> None:
+    if _watch_task is not None:
+        _watch_task.cancel()
+    if _redis is not None:
+        await _redis.close()
 
 
 @app.get("/api/keys")
-def list_keys(pattern: str = "*", cursor: int = 0, count: int = 100) -> Dict[str, Any]:
+async def list_keys(pattern: str = "*", cursor: str = "0", count: int = 100) -> Dict[str, Any]:
+    """One SCAN step. On a cluster the cursor holds the cursor of every
+    primary (see qredis.cluster.ClusterCursor); it is 0 once done."""
     r = get_r()
-    next_cursor, keys = r.scan(cursor=cursor, match=pattern, count=count)
+    start: Any = 0
+    if cursor != "0":
+        try:
+            start = ClusterCursor.parse(cursor) if r.is_cluster() else int(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    next_cursor, keys = await r.scan(cursor=start, match=pattern, count=count)
+    if isinstance(next_cursor, ClusterCursor):
+        next_cursor = str(next_cursor) if next_cursor else 0
     return {"cursor": next_cursor, "keys": keys}
 
 
-@app.get("/api/key/{key:path}")
-def get_key(key: str) -> Dict[str, Any]:
-    r = get_r()
-    if not r.exists(key):
-        raise HTTPException(status_code=404, detail="Key not found")
-    item = r.get(key)
-    # Normalize complex types to JSON-friendly shapes
-    value = item.value
+# collections are sent in windows of this many elements by default
+PAGE_SIZE = 1000
+
+PAGED_TYPES = {"hash", "list", "set", "zset", "stream"}
+
+
+def _json_value(value: Any) -> Any:
+    """Normalize complex types to JSON-friendly shapes"""
     if isinstance(value, set):
-        value = sorted(list(value))
+        return sorted(value)
     elif isinstance(value, bytes):
-        value = value.decode()
+        return value.decode()
     elif isinstance(value, tuple):
-        value = list(value)
-    return {
-        "key": item.key,
-        "type": item.type,
-        "ttl": item.ttl,
-        "value": value,
-    }
+        return list(value)
+    return value
+
+
+def _json_cursor(bookmark: Any) -> Any:
+    # stream entry IDs are strings, the other bookmarks ints
+    return bookmark.decode() if isinstance(bookmark, bytes) else bookmark
+
+
+@app.get("/api/key/{key:path}")
+async def get_key(key: str, request: Request, count: int = PAGE_SIZE) -> Response:
+    """Type, TTL and value of a key. Collections bigger than *count* only
+    come with their first window: get the next ones from /api/page starting
+    at the returned cursor (null once the whole value was sent).
+
+    Small responses are cached (the TTL shown may then be a few seconds
+    old)."""
+    r = get_r()
+    count = max(count, 1)
+
+    async def build() -> Dict[str, Any]:
+        item = await r.get(key, page_size=count)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Key not found")
+        value, length, cursor = item.value, None, None
+        if isinstance(value, PagedValue):
+            value, length, cursor = value.head, value.length, value.bookmark
+        elif item.type in PAGED_TYPES:
+            length = len(value)
+        return {
+            "key": item.key,
+            "type": item.type,
+            "ttl": item.ttl,
+            "value": _json_value(value),
+            "length": length,
+            "cursor": _json_cursor(cursor),
+        }
+
+    return await _cached_json(request, ("key", key, count), build, redis_key=key)
+
+
+@app.get("/api/page/{key:path}")
+async def get_page(
+    key: str, type: Optional[str] = None, cursor: Optional[str] = None, count: int = PAGE_SIZE
+) -> Dict[str, Any]:
+    """One window of a collection value starting at *cursor*: an index for
+    lists (LRANGE) and zsets (ZRANGE, keeping the score order), a HSCAN/SSCAN
+    cursor for hashes and sets and an entry ID for streams (XRANGE COUNT).
+    The value has the same shape as the /api/key one."""
+    r = get_r()
+    dtype = type or await r.type(key)
+    if dtype == "none":
+        raise HTTPException(status_code=404, detail="Key not found")
+    if dtype not in PAGED_TYPES:
+        raise HTTPException(status_code=400, detail=f"{dtype} values are not paged")
+    bookmark: Any = cursor or None
+    if bookmark is not None and dtype != "stream":
+        try:
+            bookmark = int(bookmark)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    value, bookmark = await r.page(key, dtype, bookmark, max(count, 1))
+    return {"key": key, "type": dtype, "value": _json_value(value), "cursor": _json_cursor(bookmark)}
+
+
+NDJSON = "application/x-ndjson"
+
+
+def _ndjson(rows: Iterable[Any]) -> str:
+    return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+
+
+@app.get("/api/stream/keys")
+async def stream_keys(pattern: str = "*", count: int = 1000) -> StreamingResponse:
+    """All the keys matching *pattern* as NDJSON (one JSON string per
+    line), sent while SCAN walks the database: only one SCAN batch is held
+    in memory at a time."""
+    r = get_r()
+
+    async def lines() -> AsyncIterator[str]:
+        async for keys in r.iter_keys(pattern, max(count, 1)):
+            yield _ndjson(keys)
+
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+
+@app.get("/api/stream/key/{key:path}")
+async def stream_key(key: str, count: int = PAGE_SIZE) -> StreamingResponse:
+    """A value as NDJSON: a {"key", "type", "ttl"} line and then one line
+    per element ([field, value] for hashes, [member, score] for zsets,
+    [id, fields] for streams, the element itself for lists and sets, the
+    whole value for strings). Collections are read *count* elements at a
+    time (see /api/page) so memory use doesn't depend on their size."""
+    r = get_r()
+    meta = await r.meta(key)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Key not found")
+    dtype, ttl = meta
+
+    async def lines() -> AsyncIterator[str]:
+        yield _ndjson([{"key": key, "type": dtype, "ttl": ttl}])
+        if dtype in PAGED_TYPES:
+            async for rows in r.iter_rows(key, dtype, max(count, 1)):
+                yield _ndjson(rows)
+        else:
+            item = await r.get(key)
+            if item is not None:
+                yield _ndjson([_json_value(item.value)])
+
+    return StreamingResponse(lines(), media_type=NDJSON)
 
 
 @app.put("/api/key/{key:path}")
-def put_key(key: str, body: Dict[str, Any]) -> Dict[str, Any]:
+async def put_key(key: str, body: Dict[str, Any]) -> Dict[str, Any]:
     r = get_r()
     dtype = body.get("type")
     value = body.get("value")
@@ -95,24 +271,26 @@ def put_key(key: str, body: Dict[str, Any]) -> Dict[str, Any]:
     if not isinstance(value, (str, int, float)):
         raise HTTPException(status_code=400, detail="Value must be a string/number")
 
-    r.set_string(key, str(value), ttl if isinstance(ttl, int) else None)
-    item = r.get(key)
+    await r.set_string(key, str(value), ttl if isinstance(ttl, int) else None)
+    _cache.invalidate(key)
+    item = await r.get(key)
     return {"ok": True, "type": item.type, "ttl": item.ttl, "value": item.value}
 
 
 @app.delete("/api/key/{key:path}")
-def delete_key(key: str) -> Dict[str, Any]:
+async def delete_key(key: str) -> Dict[str, Any]:
     r = get_r()
-    deleted = r.delete(key)
+    deleted = await r.delete(key)
+    _cache.invalidate(key)
     if not deleted:
         raise HTTPException(status_code=404, detail="Key not found")
     return {"ok": True, "deleted": deleted}
 
 
 @app.get("/api/info")
-def info() -> Dict[str, Any]:
+async def info(request: Request) -> Response:
     r = get_r()
-    return r.info()
+    return await _cached_json(request, ("info",), r.info)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -159,6 +337,29 @@ def main() -> None:
     parser.add_argument("-n", "--db", dest="redis_db", type=int, help="Redis database number")
     parser.add_argument("--redis-url", dest="redis_url", help="Redis connection URL (overrides host/port/sock/db)")
     parser.add_argument("--name", dest="client_name", default="qredis-web", help="Redis client name")
+    parser.add_argument("--cluster", action="store_true", help="Connect to a Redis Cluster through the given node")
+    parser.add_argument(
+        "--max-connections", type=int, default=100, help="Redis connections shared by all the requests (default 100)"
+    )
+    parser.add_argument(
+        "--client-cache",
+        type=int,
+        metavar="MB",
+        help="Cache values client side, kept coherent with CLIENT TRACKING (redis >= 6)",
+    )
+
+    parser.add_argument(
+        "--cache-ttl", type=float, default=2.0, help="Seconds /api/info and small /api/key responses are cached (0 disables)"
+    )
+    parser.add_argument("--cache-size", type=int, default=1024, help="Maximum number of cached responses")
+    parser.add_argument(
+        "--cache-max-value", type=int, default=64 * 1024, help="Responses bigger than this many bytes are not cached"
+    )
+    parser.add_argument(
+        "--cache-notifications",
+        action="store_true",
+        help="Drop cached keys as soon as they change (needs notify-keyspace-events, ex: KEA)",
+    )
 
     parser.add_argument("--log-level", default="INFO", choices=["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"], help="Log level")
 
@@ -184,9 +385,15 @@ def main() -> None:
             kwargs["port"] = args.redis_port
         if args.redis_db is not None:
             kwargs["db"] = args.redis_db
-
-    global _redis
-    _redis = WebRedis(**kwargs)
+    if args.client_cache:
+        kwargs["client_cache"] = args.client_cache * 1024 * 1024
+    if args.cluster:
+        kwargs["cluster"] = True
+
+    global _redis, _cache, _cache_notifications
+    _cache = ResponseCache(ttl=args.cache_ttl, max_entries=args.cache_size, max_body=args.cache_max_value)
+    _cache_notifications = args.cache_notifications
+    _redis = AsyncWebRedis(max_connections=args.max_connections, **kwargs)
 
     # Start server using Hypercorn
     config = HypercornConfig()
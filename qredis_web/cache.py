@@ -0,0 +1,103 @@
+import collections
+import hashlib
+import time
+from typing import Callable, Dict, Hashable, Optional, Set
+
+
+class CachedResponse:
+    """A serialized response body and its ETag"""
+
+    __slots__ = ("body", "etag", "expires")
+
+    def __init__(self, body: bytes, expires: float) -> None:
+        self.body = body
+        self.etag = '"{}"'.format(hashlib.blake2b(body, digest_size=12).hexdigest())
+        self.expires = expires
+
+
+class ResponseCache:
+    """In-process TTL + LRU cache of serialized API responses.
+
+    Entries expire *ttl* seconds after being stored and the least recently
+    used ones are dropped beyond *max_entries*. Bodies bigger than
+    *max_body* bytes are not stored (big values are better paged or
+    streamed than kept in memory).
+
+    Entries can be tied to a redis key so writes to it (through the API or
+    keyspace notifications) drop them right away.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 2.0,
+        max_entries: int = 1024,
+        max_body: int = 64 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "collections.OrderedDict[Hashable, CachedResponse]" = collections.OrderedDict()
+        # redis key -> cache keys of the responses built from it
+        self._by_key: Dict[str, Set[Hashable]] = {}
+        self._redis_keys: Dict[Hashable, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, cache_key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires <= self.clock():
+            self._drop(cache_key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(cache_key)
+        self.hits += 1
+        return entry
+
+    def put(self, cache_key: Hashable, body: bytes, redis_key: Optional[str] = None) -> CachedResponse:
+        """Store a body (if caching is enabled and it's small enough) and
+        return its entry"""
+        entry = CachedResponse(body, self.clock() + self.ttl)
+        if not self.enabled or len(body) > self.max_body:
+            return entry
+        self._drop(cache_key)
+        self._entries[cache_key] = entry
+        if redis_key is not None:
+            self._redis_keys[cache_key] = redis_key
+            self._by_key.setdefault(redis_key, set()).add(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, redis_key: str) -> None:
+        """Drop the responses built from the given redis key"""
+        for cache_key in self._by_key.pop(redis_key, ()):
+            self._redis_keys.pop(cache_key, None)
+            self._entries.pop(cache_key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_key.clear()
+        self._redis_keys.clear()
+
+    def _drop(self, cache_key: Hashable) -> None:
+        if self._entries.pop(cache_key, None) is None:
+            return
+        redis_key = self._redis_keys.pop(cache_key, None)
+        if redis_key is not None:
+            cache_keys = self._by_key.get(redis_key)
+            if cache_keys is not None:
+                cache_keys.discard(cache_key)
+                if not cache_keys:
+                    del self._by_key[redis_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
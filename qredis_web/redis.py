@@ -1,53 +1,30 @@
-import pickle
 import collections
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-import msgpack
-import msgpack_numpy
 from redis import Redis
-
-from qredis.util import KeyItem
-
-
-# Encoding helpers (duplicated from qredis.redis to avoid Qt dependency)
-
-def msgpack_pack(data: Any) -> bytes:
-    return msgpack.packb(data, use_bin_type=True, default=msgpack_numpy.encode)
-
-
-def msgpack_unpack(buff: bytes) -> Any:
-    return msgpack.unpackb(buff, raw=False, object_hook=msgpack_numpy.decode)
-
-
-def decode_utf8(v: bytes) -> str:
-    return v.decode()
-
-
-def decode_pickle(v: bytes) -> str:
-    return str(pickle.loads(v))
-
-
-def decode_msgpack(v: bytes) -> str:
-    return str(msgpack_unpack(v))
-
-
-DECODES = [
-    (decode_utf8, "utf-8"),
-    (decode_pickle, "pickle"),
-    (decode_msgpack, "msgpack"),
-    (str, "raw"),
-]
-
-
-def decode(value: Optional[bytes]) -> Optional[str]:
-    if value is None:
-        return None
-    for decoder, _dtype in DECODES:
-        try:
-            return decoder(value)  # type: ignore[arg-type]
-        except Exception:
-            continue
-    return None
+from redis.exceptions import ResponseError
+from redis.asyncio import (
+    BlockingConnectionPool,
+    Redis as AsyncRedis,
+    RedisCluster as AsyncRedisCluster,
+    UnixDomainSocketConnection,
+)
+
+from qredis import codec
+from qredis.cluster import AsyncClusterScanner
+from qredis.tracking import AsyncClientCache
+from qredis.util import (
+    RETRY,
+    KeyItem,
+    PagedValue,
+    fetch_all,
+    fetch_result,
+    notifications_enabled,
+    queue_fetch,
+    redis_fetch,
+    redis_page_async,
+)
 
 
 class zset(list):
@@ -76,39 +53,7 @@ class WebRedis:
 
     def __init__(self, *args, **kwargs) -> None:
         self.redis = Redis(*args, **kwargs)
-        self._get_type_map = {
-            "none": lambda k: None,
-            "string": self._get,
-            "hash": self._hgetall,
-            "list": self._lgetall,
-            "set": self._sgetall,
-            "zset": self._zgetall,
-            "stream": self._xrange,
-        }
-
-    # Typed getters
-    def _get(self, key: str) -> Optional[str]:
-        return decode(self.redis.get(key))
-
-    def _hgetall(self, key: str) -> Dict[str, str]:
-        return {decode(k) or "": decode(v) or "" for k, v in self.redis.hgetall(key).items()}
-
-    def _lgetall(self, key: str) -> List[str]:
-        return [decode(i) or "" for i in self.redis.lrange(key, 0, -1)]
-
-    def _sgetall(self, key: str) -> Set[str]:
-        return {decode(i) or "" for i in self.redis.smembers(key)}
-
-    def _zgetall(self, key: str) -> Dict[str, str]:
-        return {decode(member) or "": decode(score) or "" for member, score in self.redis.zscan_iter(key)}
-
-    def _xrange(self, key: str) -> List[Tuple[str, Dict[str, str]]]:
-        data: List[Tuple[str, Dict[str, str]]] = []
-        for entry_id, entry_data_raw in self.redis.xrange(key):
-            event_time = decode(entry_id) or ""
-            event_data = {decode(member) or "": decode(score) or "" for member, score in entry_data_raw.items()}
-            data.append((event_time, event_data))
-        return data
+        self._decode_type_map: Dict[str, Callable[..., Any]] = dict(codec.TYPE_DECODES)
 
     # Public API
     def type(self, name: str) -> str:
@@ -125,19 +70,21 @@ class WebRedis:
         return self.exists(key)
 
     def get(self, key: str, default: Optional[Any] = None) -> KeyItem:
-        if not self.exists(key):
+        fetched = redis_fetch(self.redis, key)
+        if fetched is None:
             return default  # type: ignore[return-value]
-        dtype = self.type(key)
-        ttl = self.ttl(key)
-        value = self._get_type_map[dtype](key)
+        dtype, ttl, value, _, _ = fetched
+        if dtype in self._decode_type_map:
+            value = self._decode_type_map[dtype](value, key)
         return KeyItem(self, key, dtype, ttl, value)
 
     def scan(self, cursor: int = 0, match: str = "*", count: int = 100) -> Tuple[int, List[str]]:
         next_cursor, keys = self.redis.scan(cursor=cursor, match=match, count=count)
         return int(next_cursor), [k.decode() if isinstance(k, (bytes, bytearray)) else str(k) for k in keys]
 
-    def keys(self, pattern: str = "*") -> List[str]:
-        return [k.decode() for k in self.redis.keys(pattern)]
+    def keys(self, pattern: str = "*", count: int = 1000) -> List[str]:
+        """All the keys matching pattern, read with SCAN (never KEYS)"""
+        return [k.decode() for k in self.redis.scan_iter(match=pattern, count=count)]
 
     def delete(self, *keys: str) -> int:
         return int(self.redis.delete(*keys))
@@ -154,3 +101,222 @@ class WebRedis:
     def info(self) -> Dict[str, Any]:
         return self.redis.info()  # type: ignore[no-any-return]
 
+
+
+class AsyncWebRedis:
+    """WebRedis on redis.asyncio, for async endpoints.
+
+    All the requests share one connection pool (at most max_connections
+    sockets, requests wait up to pool_timeout seconds for a free one beyond
+    that) so a slow command only holds its own connection instead of a
+    server thread.
+
+    With *client_cache* (bytes), get() answers from a client side cache
+    kept coherent by CLIENT TRACKING (see qredis.tracking.ClientCache).
+
+    With *cluster*, the given node is the entry point of a Redis Cluster:
+    per-key commands go to the shard owning the key and scan() runs one
+    SCAN step on every primary concurrently.
+    """
+
+    TYPE_MAP = WebRedis.TYPE_MAP
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        pool_timeout: float = 20,
+        client_cache: Optional[int] = None,
+        cluster: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        self.pool: Optional[BlockingConnectionPool] = None
+        self.scanner: Optional[AsyncClusterScanner] = None
+        if cluster:
+            if client_cache:
+                raise ValueError("the client side cache is not available on clusters")
+            if "unix_socket_path" in kwargs:
+                raise ValueError("clusters are reached over TCP")
+            # clusters only have db 0; one pool (of max_connections) per node
+            kwargs.pop("db", None)
+            self.redis = AsyncRedisCluster(max_connections=max_connections, **kwargs)
+            self.scanner = AsyncClusterScanner(self.redis)
+        else:
+            if "unix_socket_path" in kwargs:
+                kwargs["path"] = kwargs.pop("unix_socket_path")
+                kwargs["connection_class"] = UnixDomainSocketConnection
+            self.pool = BlockingConnectionPool(max_connections=max_connections, timeout=pool_timeout, **kwargs)
+            self.redis = AsyncRedis(connection_pool=self.pool)
+        self.cache: Optional[AsyncClientCache] = None
+        if client_cache:
+            self.cache = AsyncClientCache(self.redis, max_memory=client_cache)
+            self.cache.start()
+        self._decode_type_map: Dict[str, Callable[..., Any]] = dict(codec.TYPE_DECODES)
+
+    # Public API
+    async def type(self, name: str) -> str:
+        return (await self.redis.type(name)).decode()
+
+    async def ttl(self, key: str) -> int:
+        ttl = await self.redis.ttl(key)
+        return -1 if ttl is None else int(ttl)
+
+    async def exists(self, key: str) -> bool:
+        return bool(await self.redis.exists(key))
+
+    async def meta(self, key: str) -> Optional[Tuple[str, int]]:
+        """Type and TTL of a key in one round trip (None if it doesn't exist)"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.type(key)
+        pipe.ttl(key)
+        dtype, ttl = await pipe.execute()
+        dtype = dtype.decode()
+        if dtype == "none":
+            return None
+        return dtype, -1 if ttl is None else int(ttl)
+
+    async def has_key(self, key: str) -> bool:
+        return await self.exists(key)
+
+    async def get(self, key: str, default: Optional[Any] = None, page_size: Optional[int] = None) -> KeyItem:
+        """With *page_size*, collections bigger than it are not fetched in
+        full: the value is a PagedValue holding the first window (the rest
+        can be read with page())."""
+        cache = self.cache if self.cache is not None and self.cache.enabled else None
+        if cache is not None:
+            cached = cache.get(key, page_size)
+            if cached is not None:
+                return cached  # type: ignore[no-any-return]
+            stamp = cache.stamp()
+        pipe = self.redis.pipeline(transaction=False)
+        queue_fetch(pipe, key, page_size)
+        fetched = fetch_result(await pipe.execute(raise_on_error=False), page_size)
+        if fetched is None:
+            return default  # type: ignore[return-value]
+        dtype, ttl, value, length, bookmark = fetched
+        if value is RETRY:
+            value = await fetch_all(self.redis, key, dtype)
+        if dtype in self._decode_type_map:
+            value = self._decode_type_map[dtype](value, key)
+        if bookmark is not None:
+            value = PagedValue(value, length, bookmark)
+        item = KeyItem(self, key, dtype, ttl, value)
+        if cache is not None:
+            cache.put(key, page_size, item, stamp)
+        return item
+
+    def _invalidate(self, *keys: str) -> None:
+        # the server notification comes later on another connection: a
+        # read right after a write must not get the old value
+        if self.cache is not None:
+            self.cache.invalidate(keys)
+
+    async def page(self, key: str, dtype: str, bookmark: Any = None, count: int = 1000) -> Tuple[Any, Any]:
+        """One window of a collection value (see qredis.util.redis_page) and
+        the bookmark of the next one (None at the end)"""
+        items, bookmark = await redis_page_async(self.redis, key, dtype, bookmark, count)
+        return self._decode_type_map[dtype](items, key), bookmark
+
+    def is_cluster(self) -> bool:
+        return self.scanner is not None
+
+    async def scan(self, cursor: Any = 0, match: str = "*", count: int = 100) -> Tuple[Any, List[str]]:
+        """One SCAN step. On a cluster all the primaries are scanned at once
+        and the cursor is a qredis.cluster.ClusterCursor (false once done)."""
+        if self.scanner is not None:
+            next_cursor, keys = await self.scanner.scan(cursor, match=match, count=count)
+        else:
+            next_cursor, keys = await self.redis.scan(cursor=cursor, match=match, count=count)
+            next_cursor = int(next_cursor)
+        return next_cursor, [k.decode() if isinstance(k, (bytes, bytearray)) else str(k) for k in keys]
+
+    async def iter_keys(self, match: str = "*", count: int = 1000) -> AsyncIterator[List[str]]:
+        """Walk the whole SCAN, one batch of keys at a time"""
+        cursor: Any = 0
+        while True:
+            cursor, keys = await self.scan(cursor, match=match, count=count)
+            if keys:
+                yield keys
+            if not cursor:
+                break
+
+    async def iter_rows(self, key: str, dtype: str, count: int = 1000) -> AsyncIterator[List[Any]]:
+        """Walk a collection value one window of rows at a time: [field,
+        value] for hashes, [member, score] for zsets, [id, fields] for
+        streams and plain elements for lists and sets"""
+        bookmark = None
+        while True:
+            value, bookmark = await self.page(key, dtype, bookmark, count)
+            if isinstance(value, dict):
+                yield [list(item) for item in value.items()]
+            else:
+                yield list(value)
+            if bookmark is None:
+                break
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        """All the keys matching pattern, read with SCAN (never KEYS)"""
+        return [key async for keys in self.iter_keys(pattern) for key in keys]
+
+    async def delete(self, *keys: str) -> int:
+        try:
+            return int(await self.redis.delete(*keys))
+        finally:
+            self._invalidate(*keys)
+
+    async def rename(self, old_key: str, new_key: str) -> None:
+        try:
+            await self.redis.rename(old_key, new_key)
+        finally:
+            self._invalidate(old_key, new_key)
+
+    async def set_string(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.set(key, value)
+                if ttl is not None and ttl >= 0:
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+        finally:
+            self._invalidate(key)
+
+    async def info(self) -> Dict[str, Any]:
+        return await self.redis.info()  # type: ignore[no-any-return]
+
+    async def watch_keys(self, callback: Callable[[str], None]) -> None:
+        """Call callback(key) for every key written or removed until cancelled.
+
+        Follows keyevent (or keyspace) notifications on a pubsub connection.
+        Raises RuntimeError if the server doesn't publish them (see
+        notify-keyspace-events: E or K and A are needed) or on clusters
+        (each node only publishes the events of its own keys).
+        """
+        if self.pool is None:
+            raise RuntimeError("keyspace notifications are not followed on clusters")
+        try:
+            config = await self.redis.config_get("notify-keyspace-events")
+        except ResponseError:
+            # CONFIG is often disabled on managed servers: trust the user
+            logging.warning("could not check notify-keyspace-events, assuming keyevent notifications are on")
+            config = {"notify-keyspace-events": "EA"}
+        flags = config.get("notify-keyspace-events", "")
+        if not notifications_enabled(flags):
+            raise RuntimeError(f"keyspace notifications disabled (notify-keyspace-events={flags!r})")
+        db = self.pool.connection_kwargs.get("db", 0)
+        keyevent = "E" in flags
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.psubscribe(f"__keyevent@{db}__:*" if keyevent else f"__keyspace@{db}__:*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                key = message["data"] if keyevent else message["channel"].split(b":", 1)[1]
+                callback(key.decode(errors="replace"))
+        finally:
+            await pubsub.aclose()
+
+    async def close(self) -> None:
+        if self.cache is not None:
+            self.cache.stop()
+        await self.redis.aclose()
+        if self.pool is not None:
+            await self.pool.aclose()
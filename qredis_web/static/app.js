@@ -18,6 +18,17 @@
   let currentKey = null;
   let currentType = null;
 
+  // collection values are loaded page by page while scrolling
+  const PAGE_SIZE = 500;
+  let valueCursor = null;
+  let valueLoaded = 0;
+  let valueLength = null;
+  let loadingPage = false;
+  let pageObserver = null;
+  // bumped whenever another value is opened: responses tagged with an
+  // older one are dropped
+  let valueView = 0;
+
   async function fetchJSON(url, opts) {
     const res = await fetch(url, opts);
     if (!res.ok) {
@@ -38,7 +49,7 @@
   async function loadKeys(cursor=0) {
     const pattern = patternEl.value || '*';
     lastPattern = pattern;
-    const data = await fetchJSON(`/api/keys?pattern=${encodeURIComponent(pattern)}&cursor=${cursor}&count=100`);
+    const data = await fetchJSON(`/api/keys?pattern=${encodeURIComponent(pattern)}&cursor=${encodeURIComponent(cursor)}&count=100`);
     keysEl.innerHTML = '';
     for (const k of data.keys) {
       const li = document.createElement('li');
@@ -50,8 +61,114 @@
     setPager(data.cursor, data.keys.length > 0 && data.cursor !== 0);
   }
 
+  // [label, value] rows of a value window, in its /api/key shape
+  function valueRows(type, value, offset) {
+    if (type === 'hash' || type === 'zset') {
+      return Object.entries(value);
+    } else if (type === 'list') {
+      return value.map((v, i) => [String(offset + i), v]);
+    } else if (type === 'set') {
+      return value.map((v) => [null, v]);
+    } else if (type === 'stream') {
+      return value.map(([id, fields]) => [id, JSON.stringify(fields)]);
+    }
+    return [[null, JSON.stringify(value)]];
+  }
+
+  function appendRows(rows) {
+    const table = valueEl.querySelector('table.rows');
+    const body = table.tBodies[0];
+    for (const [label, v] of rows) {
+      const tr = document.createElement('tr');
+      if (label !== null) {
+        const th = document.createElement('th');
+        th.textContent = label;
+        tr.appendChild(th);
+      }
+      const td = document.createElement('td');
+      td.textContent = v;
+      tr.appendChild(td);
+      body.appendChild(tr);
+    }
+    valueLoaded += rows.length;
+    const status = valueEl.querySelector('.page-status');
+    const total = valueLength === null ? '?' : valueLength;
+    status.textContent = valueCursor === null
+      ? `${valueLoaded} items`
+      : `${valueLoaded} of ${total} items, scroll for more`;
+  }
+
+  async function loadNextPage() {
+    if (loadingPage || valueCursor === null || !currentKey) return;
+    loadingPage = true;
+    const view = valueView;
+    const url = `/api/page/${encodeURIComponent(currentKey)}?type=${currentType}` +
+      `&cursor=${encodeURIComponent(valueCursor)}&count=${PAGE_SIZE}`;
+    let data;
+    try {
+      data = await fetchJSON(url);
+    } finally {
+      if (view === valueView) loadingPage = false;
+    }
+    // another key (or the same one again) was opened meanwhile
+    if (view !== valueView) return;
+    valueCursor = data.cursor;
+    appendRows(valueRows(data.type, data.value, valueLoaded));
+    if (valueCursor === null) {
+      stopPaging();
+    } else if (isVisible(valueEl.querySelector('.page-sentinel'))) {
+      // window didn't fill the view: keep going
+      loadNextPage();
+    }
+  }
+
+  function isVisible(el) {
+    const view = valueEl.closest('section').getBoundingClientRect();
+    const rect = el.getBoundingClientRect();
+    return rect.top < view.bottom;
+  }
+
+  function stopPaging() {
+    if (pageObserver) {
+      pageObserver.disconnect();
+      pageObserver = null;
+    }
+  }
+
+  // forget the value shown, including its page request in flight
+  function resetPaging() {
+    stopPaging();
+    valueView++;
+    valueCursor = null;
+    loadingPage = false;
+  }
+
+  function showCollection(data) {
+    valueCursor = data.cursor;
+    valueLength = data.length;
+    valueLoaded = 0;
+    const table = document.createElement('table');
+    table.className = 'rows';
+    table.appendChild(document.createElement('tbody'));
+    const status = document.createElement('div');
+    status.className = 'page-status';
+    const sentinel = document.createElement('div');
+    sentinel.className = 'page-sentinel';
+    valueEl.append(table, status, sentinel);
+    appendRows(valueRows(data.type, data.value, 0));
+    if (valueCursor !== null) {
+      pageObserver = new IntersectionObserver((entries) => {
+        if (entries.some((e) => e.isIntersecting)) loadNextPage();
+      }, { root: valueEl.closest('section'), rootMargin: '200px' });
+      pageObserver.observe(sentinel);
+    }
+  }
+
   async function openKey(key) {
-    const data = await fetchJSON(`/api/key/${encodeURIComponent(key)}`);
+    resetPaging();
+    const view = valueView;
+    const data = await fetchJSON(`/api/key/${encodeURIComponent(key)}?count=${PAGE_SIZE}`);
+    if (view !== valueView) return;  // another key was opened meanwhile
     currentKey = data.key;
     currentType = data.type;
     metaKey.textContent = data.key;
@@ -69,9 +186,7 @@
       valueEl.appendChild(ta);
       saveBtn.disabled = false;
     } else {
-      const pre = document.createElement('pre');
-      pre.textContent = JSON.stringify(data.value, null, 2);
-      valueEl.appendChild(pre);
+      showCollection(data);
       saveBtn.disabled = true;
     }
   }
@@ -94,6 +209,7 @@
     if (!currentKey) return;
     if (!confirm(`Delete key "${currentKey}"?`)) return;
     await fetchJSON(`/api/key/${encodeURIComponent(currentKey)}`, { method: 'DELETE' });
+    resetPaging();
     currentKey = null;
     metaKey.textContent = '';
     metaType.textContent = '';
@@ -27,7 +27,8 @@ setup(
             "fastapi>=0.110; python_version>='3.8'",
             "hypercorn>=0.15; python_version>='3.8'",
             "jinja2>=3; python_version>='3.8'",
-        ]
+        ],
+        "async": ["redis>=4.2", "qasync"],
     },
     keywords="redis,GUI,Qt",
     classifiers=[
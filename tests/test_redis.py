@@ -0,0 +1,59 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import qredis.redis
+from qredis.redis import QRedis, ValueDiff
+from qredis.util import KeySummary
+
+
+@pytest.fixture
+def qredis_(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        qredis.redis, "Redis", lambda *a, **kw: fakeredis.FakeRedis(server=server)
+    )
+    return QRedis()
+
+
+def record(signal):
+    events = []
+    signal.connect(events.append)
+    return events
+
+
+def test_apply_new_key_emits_keys_added(qredis_):
+    added, deleted = record(qredis_.keysAdded), record(qredis_.keysDeleted)
+    diff = ValueDiff("hash", 0, {}, {}, set(), [(0, ("f", "v"))])
+    qredis_.apply("h", diff)
+    assert qredis_.redis.hgetall("h") == {b"f": b"v"}
+    assert added == [("h",)]
+    assert deleted == []
+
+
+def test_setitem_diff_emits_keys_added_once(qredis_):
+    added = record(qredis_.keysAdded)
+    qredis_["s"] = ValueDiff("set", 0, {}, {}, set(), [(0, ("m",))])
+    assert added == [("s",)]
+
+
+def test_apply_emptying_diff_emits_keys_deleted(qredis_):
+    qredis_.redis.hset("h", "f", "v")
+    added, deleted = record(qredis_.keysAdded), record(qredis_.keysDeleted)
+    diff = ValueDiff("hash", 1, {0: ("f", "v")}, {}, {0}, [])
+    qredis_.apply("h", diff, watch=True)
+    assert not qredis_.redis.exists("h")
+    assert added == []
+    assert deleted == [("h",)]
+
+
+def test_rename_invalidates_metadata(qredis_):
+    metadata = qredis_.metadata
+    qredis_.redis.set("a", "v")
+    metadata._fetching.add("a")
+    metadata._on_fetched(["a"], {"a": KeySummary("a", "string", -1, 1, 50, "v")})
+    assert metadata.peek("a") is not None
+    invalidated = record(metadata.invalidated)
+    qredis_.rename("a", "b")
+    assert metadata.peek("a") is None
+    assert invalidated == [["a"]]
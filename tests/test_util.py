@@ -0,0 +1,35 @@
+import pytest
+
+from qredis.util import glob_matcher, missing_notification_flags, notifications_enabled
+
+
+@pytest.mark.parametrize("flags", ["EA", "KA", "KEA", "Eg$lshzxe", "Kxeg$lshz"])
+def test_notifications_enabled(flags):
+    assert notifications_enabled(flags)
+    assert missing_notification_flags(flags) == ""
+
+
+@pytest.mark.parametrize("flags", ["", "A", "g", "Eg", "Kg$", "E$lshzxe"])
+def test_notifications_disabled(flags):
+    assert not notifications_enabled(flags)
+    assert notifications_enabled(flags + missing_notification_flags(flags))
+
+
+@pytest.mark.parametrize(
+    "pattern, key, matches",
+    [
+        ("user:*", "user:1", True),
+        ("user:*", "User:1", False),
+        ("USER:*", "user:1", False),
+        ("h?llo", "hello", True),
+        ("h[ae]llo", "hallo", True),
+        ("h[^e]llo", "hello", False),
+        ("h[a-b]llo", "hbllo", True),
+        ("a\\*b", "a*b", True),
+        ("a\\*b", "axb", False),
+        ("a[\\]]b", "a]b", True),
+        ("line*", "line\nbreak", True),
+    ],
+)
+def test_glob_matcher(pattern, key, matches):
+    assert bool(glob_matcher(pattern)(key)) is matches